@@ -0,0 +1,43 @@
+"""Notes full-text search
+
+Revision ID: 5c1f9a7e2b3d
+Revises: d112326b1e34
+Create Date: 2026-10-17 09:12:41.118403
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.search import install_search, uninstall_search
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f9a7e2b3d'
+down_revision: Union[str, None] = 'd112326b1e34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_searchable_note_table(bind) -> bool:
+    # Поиск нужен схеме notes_api_final (title/content); у заметок app.main только text
+    inspector = sa.inspect(bind)
+    if not inspector.has_table('note'):
+        return False
+    columns = {column['name'] for column in inspector.get_columns('note')}
+    return {'title', 'content'} <= columns
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    if _has_searchable_note_table(bind):
+        install_search(bind)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if _has_searchable_note_table(bind):
+        uninstall_search(bind)
@@ -0,0 +1,55 @@
+import json
+import time
+from typing import Optional
+
+from app.cache import LocalTTLCache
+
+
+class PrincipalCache:
+    """TTL-bounded cache of authenticated principals keyed by token subject.
+
+    Optional Redis backing shares entries and revocations between workers.
+    ``invalidate`` drops the cached principal and marks tokens issued up to now
+    as stale, so their embedded claims are no longer trusted either.
+    """
+
+    def __init__(self, ttl: float = 30, maxsize: int = 10000, revocation_ttl: int = 1800, redis_client=None, prefix: str = "principal"):
+        self.ttl = ttl
+        self.revocation_ttl = revocation_ttl
+        self.local = LocalTTLCache(maxsize=maxsize, ttl=ttl)
+        self.revoked = LocalTTLCache(maxsize=maxsize, ttl=revocation_ttl)
+        self.redis = redis_client
+        self.prefix = prefix
+
+    async def get(self, subject: str) -> Optional[dict]:
+        principal = self.local.get(subject)
+        if principal is None and self.redis is not None:
+            raw = await self.redis.get(f"{self.prefix}:{subject}")
+            if raw:
+                principal = json.loads(raw)
+                self.local.set(subject, principal)
+        return principal
+
+    async def set(self, subject: str, principal: dict):
+        self.local.set(subject, principal)
+        if self.redis is not None:
+            await self.redis.set(f"{self.prefix}:{subject}", json.dumps(principal), ex=max(1, int(self.ttl)))
+
+    async def invalidate(self, subject: str):
+        revoked_at = time.time()
+        self.local.pop(subject)
+        self.revoked.set(subject, revoked_at)
+        if self.redis is not None:
+            await self.redis.delete(f"{self.prefix}:{subject}")
+            await self.redis.set(f"{self.prefix}:revoked:{subject}", revoked_at, ex=self.revocation_ttl)
+
+    async def is_revoked(self, subject: str, issued_at: Optional[float]) -> bool:
+        revoked_at = self.revoked.get(subject)
+        if revoked_at is None and self.redis is not None:
+            raw = await self.redis.get(f"{self.prefix}:revoked:{subject}")
+            if raw:
+                revoked_at = float(raw)
+                self.revoked.set(subject, revoked_at)
+        if revoked_at is None:
+            return False
+        return issued_at is None or issued_at <= revoked_at
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator, List, Optional, Set
+
+logger = logging.getLogger("uvicorn.error")
+
+
+class InMemoryBroadcastBackend:
+    """Замена Redis для одного процесса и тестов: тот же publish/subscribe."""
+
+    def __init__(self):
+        self._subscribers: dict[str, Set[asyncio.Queue]] = {}
+
+    async def publish(self, channel: str, payload: str):
+        for queue in self._subscribers.get(channel, ()):
+            queue.put_nowait(payload)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(channel, set()).add(queue)
+        return self._iterate(channel, queue)
+
+    async def _iterate(self, channel: str, queue: asyncio.Queue) -> AsyncIterator[str]:
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._subscribers[channel].discard(queue)
+
+
+class RedisBroadcastBackend:
+    """Pub/sub через общий клиент Redis: каждый воркер получает все сообщения."""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    async def publish(self, channel: str, payload: str):
+        await self.redis.publish(channel, payload)
+
+    async def subscribe(self, channel: str) -> AsyncIterator[str]:
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(channel)
+        return self._iterate(channel, pubsub)
+
+    async def _iterate(self, channel: str, pubsub) -> AsyncIterator[str]:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    data = message["data"]
+                    yield data.decode() if isinstance(data, bytes) else data
+        finally:
+            await pubsub.unsubscribe(channel)
+            await pubsub.aclose()
+
+
+class Broadcaster:
+    """Рассылка по всем воркерам: пачка сообщений → один PUBLISH → локальный fan-out.
+
+    Сообщения, пришедшие за flush_interval, склеиваются в один JSON-массив;
+    он кодируется один раз на пачку, а сокетам уходит уже готовая строка.
+    """
+
+    def __init__(self, backend, manager, channel: str = "ws:broadcast", flush_interval: float = 0.005, max_batch: int = 100):
+        self.backend = backend
+        self.manager = manager
+        self.channel = channel
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._pending: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+
+    async def publish(self, message: str):
+        self._pending.append(message)
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        try:
+            await self.backend.publish(self.channel, json.dumps(batch, ensure_ascii=False))
+        except Exception:
+            logger.exception("Broadcast publish failed")
+
+    async def _listen(self):
+        while True:
+            try:
+                subscription = await self.backend.subscribe(self.channel)
+                self._subscribed.set()
+                async for payload in subscription:
+                    for message in json.loads(payload):
+                        await self.manager.broadcast(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Broadcast subscription failed, reconnecting")
+                await asyncio.sleep(1)
+
+    async def start(self):
+        self._listener = asyncio.create_task(self._listen())
+        await self._subscribed.wait()
+
+    async def stop(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
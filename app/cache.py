@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, NamedTuple, Optional
+
+from prometheus_client import Counter
+
+# Метрики кэша попадают в общий /metrics через Instrumentator (default registry)
+CACHE_EVENTS = Counter(
+    "app_cache_events_total",
+    "Обращения к двухуровневому кэшу",
+    ["cache", "event"],
+)
+
+_MISSING = object()
+
+# Версия и значение одним запросом вместо двух последовательных GET
+READ_SCRIPT = """
+local version = redis.call('GET', KEYS[1]) or '0'
+local value = redis.call('GET', ARGV[1] .. ':v' .. version .. ':' .. ARGV[2])
+return {version, value}
+"""
+
+
+class CachedBody(NamedTuple):
+    """Готовое тело ответа и его ETag — отдаются без повторной сериализации."""
+
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_bytes(cls, body: bytes) -> "CachedBody":
+        return cls(body, '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest())
+
+    # В Redis храним "etag\nbody": компактный JSON не содержит сырых переводов строк
+    @staticmethod
+    def dumps(entry: "CachedBody") -> str:
+        return entry.etag + "\n" + entry.body.decode()
+
+    @classmethod
+    def loads(cls, raw: str) -> "CachedBody":
+        etag, _, body = raw.partition("\n")
+        return cls(body.encode(), etag)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class LocalTTLCache:
+    """In-process LRU с ограничением по времени жизни записей."""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 2.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class Prefetch(NamedTuple):
+    """Чтение из Redis, поставленное в pipeline запроса, и поколение кэша на момент постановки."""
+
+    read: Awaitable
+    generation: int
+
+
+class TwoTierCache:
+    """Локальный LRU/TTL перед Redis с версионированными ключами и single-flight.
+
+    Запись не удаляет ключ, а увеличивает версию: старые значения доживают до TTL,
+    а пересборку нового значения в каждом воркере выполняет только одна корутина.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        redis_client,
+        ttl: int = 60,
+        local_ttl: float = 2.0,
+        local_maxsize: int = 128,
+        dumps: Callable[[Any], str] = json.dumps,
+        loads: Callable[[str], Any] = json.loads,
+    ):
+        self.name = name
+        self.redis = redis_client
+        self.ttl = ttl
+        self.local = LocalTTLCache(maxsize=local_maxsize, ttl=local_ttl)
+        self.dumps = dumps
+        self.loads = loads
+        self._generation = 0
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Ссылки на задачи загрузки: после invalidate их уже нет в _inflight
+        self._tasks: set = set()
+        self._read_script = redis_client.register_script(READ_SCRIPT)
+
+    @property
+    def version_key(self) -> str:
+        return f"{self.name}:version"
+
+    def prefetch(self, batcher, key: str = "all") -> Optional[Prefetch]:
+        """Ставит чтение из Redis в общий pipeline запроса; None, если значение есть локально."""
+        if self.local.get(key, _MISSING) is not _MISSING:
+            return None
+        return Prefetch(batcher.script(self._read_script, [self.version_key], [self.name, key]), self._generation)
+
+    async def get_or_load(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        key: str = "all",
+        prefetched: Optional[Prefetch] = None,
+    ) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            CACHE_EVENTS.labels(self.name, "local_hit").inc()
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            CACHE_EVENTS.labels(self.name, "coalesced").inc()
+        else:
+            # Предзагруженное чтение могло уйти до инвалидации: сравниваем с поколением на момент постановки
+            generation = prefetched.generation if prefetched is not None else self._generation
+            # Загрузка — отдельная задача: отмена первого запроса (клиент ушёл) не роняет остальных
+            task = asyncio.ensure_future(self._fill(key, loader, prefetched, generation))
+            self._inflight[key] = task
+            self._tasks.add(task)
+            task.add_done_callback(self._forget)
+        return await asyncio.shield(task)
+
+    def _forget(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        # Исключение получат ожидающие; без них не ругаемся в лог
+        if not task.cancelled():
+            task.exception()
+
+    async def _fill(self, key: str, loader: Callable[[], Awaitable[Any]], prefetched: Optional[Prefetch], generation: int) -> Any:
+        try:
+            value = await self._load(key, loader, prefetched)
+            # Если во время загрузки была инвалидация, локально не сохраняем
+            if generation == self._generation:
+                self.local.set(key, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    async def _read(self, key: str, prefetched: Optional[Prefetch]) -> list:
+        if prefetched is not None:
+            try:
+                return await prefetched.read
+            except Exception:
+                # Общий pipeline не удался — читаем отдельно
+                pass
+        return await self._read_script(keys=[self.version_key], args=[self.name, key])
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], prefetched: Optional[Prefetch] = None) -> Any:
+        result = await self._read(key, prefetched)
+        # Lua-таблица обрывается на nil: при промахе приходит только версия
+        version, cached = result[0], result[1] if len(result) > 1 else None
+        redis_key = f"{self.name}:v{version}:{key}"
+        if cached is not None:
+            CACHE_EVENTS.labels(self.name, "redis_hit").inc()
+            return self.loads(cached)
+
+        CACHE_EVENTS.labels(self.name, "miss").inc()
+        value = await loader()
+        await self.redis.set(redis_key, self.dumps(value), ex=self.ttl)
+        return value
+
+    async def invalidate(self):
+        self._generation += 1
+        self._inflight.clear()
+        self.local.clear()
+        await self.redis.incr(self.version_key)
+        CACHE_EVENTS.labels(self.name, "invalidate").inc()
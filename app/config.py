@@ -1,16 +1,99 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     DATABASE_URL: str
     REDIS_URL: str
+    # Один пул на процесс: запросы + по соединению на каждую pub/sub подписку
+    REDIS_MAX_CONNECTIONS: int = 50
+    # Сколько ждать свободного соединения, прежде чем вернуть ошибку
+    REDIS_POOL_TIMEOUT: float = 5.0
     SECRET_KEY: str
     EMAIL_FROM: str
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: str
 
+    # SMTP для Celery-воркера (локально: python -m aiosmtpd -n -l localhost:1025)
+    SMTP_HOST: str = "localhost"
+    SMTP_PORT: int = 1025
+    SMTP_USERNAME: Optional[str] = None
+    SMTP_PASSWORD: Optional[str] = None
+    SMTP_USE_TLS: bool = False
+    SMTP_POOL_SIZE: int = 2
+    EMAIL_BATCH_SIZE: int = 100
+
+    # Лёгкие фоновые задачи (send_email): celery | asyncio (в процессе приложения)
+    TASK_BACKEND: str = "celery"
+    TASK_CONCURRENCY: int = 4
+    TASK_QUEUE_SIZE: int = 1000
+    TASK_MAX_RETRIES: int = 3
+    TASK_RETRY_DELAY: float = 0.5
+    TASK_DRAIN_TIMEOUT: float = 30.0
+
+    # echo=True пишет каждый запрос синхронно; в проде вместо него лог медленных запросов и N+1
+    DB_ECHO: bool = False
+    DB_SLOW_QUERY_SECONDS: float = 0.2
+    DB_REPEATED_QUERY_THRESHOLD: int = 10
+    # Реплики для чтения: ["postgresql+asyncpg://...", ...]; пусто — всё на primary
+    DATABASE_REPLICA_URLS: List[str] = []
+    # round_robin | least_connections
+    DB_REPLICA_STRATEGY: str = "round_robin"
+    # Сколько секунд после своей записи клиент читает с primary
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0
+    DB_REPLICA_HEALTH_INTERVAL: float = 5.0
+
     RATE_LIMIT_REQUESTS: int = 5
     RATE_LIMIT_SECONDS: int = 60
+    # fixed_window | sliding_window | token_bucket
+    RATE_LIMIT_ALGORITHM: str = "fixed_window"
+    # {"POST /notes": "10/60/token_bucket", "/health": "1000/60"}
+    RATE_LIMIT_ROUTES: Dict[str, str] = {}
+
+    # Адаптивный лимит одновременных запросов: при перегрузке 503 + Retry-After
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_INITIAL_LIMIT: int = 50
+    ADMISSION_MIN_LIMIT: int = 4
+    ADMISSION_MAX_LIMIT: int = 500
+    ADMISSION_QUEUE_SIZE: int = 200
+    ADMISSION_TARGET_DELAY: float = 0.05
+    ADMISSION_INTERVAL: float = 0.5
+    ADMISSION_LATENCY_TARGET: float = 1.0
+    ADMISSION_RETRY_AFTER: int = 1
+    # critical — без очереди, high — раньше normal; авторизованные записи по умолчанию high
+    ADMISSION_PRIORITIES: Dict[str, str] = {"/health": "critical", "/metrics": "critical", "/admin": "critical"}
+
+    # drop_oldest | disconnect
+    WS_SLOW_CONSUMER_POLICY: str = "drop_oldest"
+    WS_SEND_QUEUE_SIZE: int = 100
+    # redis | memory (один процесс)
+    BROADCAST_BACKEND: str = "redis"
+    BROADCAST_FLUSH_INTERVAL: float = 0.005
+
+    # /admin/profile выключен, пока токен не задан
+    PROFILER_TOKEN: Optional[str] = None
+    PROFILER_MAX_SECONDS: float = 60.0
+
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SLOW_SECONDS: float = 1.0
+    LOG_QUEUE_SIZE: int = 10000
+
+    NOTES_CACHE_TTL: int = 60
+    NOTES_LOCAL_CACHE_TTL: float = 2.0
+    NOTES_LOCAL_CACHE_SIZE: int = 128
+
+    NOTES_PAGE_DEFAULT_LIMIT: int = 100
+    NOTES_PAGE_MAX_LIMIT: int = 1000
+    NOTES_STREAM_BATCH_SIZE: int = 500
+    NOTES_BULK_BATCH_SIZE: int = 1000
+    # Сколько последних событий ленты хранится для ?since=
+    NOTES_FEED_HISTORY: int = 1000
+    # Group commit для POST /notes: пачка до MAX_ROWS заметок или MAX_DELAY секунд от первой
+    NOTES_WRITE_BUFFER: bool = False
+    NOTES_WRITE_BUFFER_MAX_ROWS: int = 100
+    NOTES_WRITE_BUFFER_MAX_DELAY: float = 0.005
+    # commit — ответ после commit пачки; flush — после INSERT, до commit (быстрее, но сбой commit теряет заметки)
+    NOTES_WRITE_BUFFER_DURABILITY: str = "commit"
 
 settings = Settings()
@@ -1,4 +1,7 @@
 
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from .models import Note
@@ -11,6 +14,40 @@ async def create_note(session: AsyncSession, note_data: NoteCreate) -> Note:
     await session.refresh(note)
     return note
 
+async def bulk_create_notes(
+    session: AsyncSession,
+    notes_data: List[NoteCreate],
+    created_at: Optional[datetime] = None,
+    commit: bool = True,
+) -> List[int]:
+    # Один INSERT ... RETURNING на пачку (insertmanyvalues) и один commit вместо commit+refresh на каждую заметку
+    if not notes_data:
+        return []
+    created_at = created_at or datetime.utcnow()
+    statement = insert(Note).returning(Note.id, sort_by_parameter_order=True)
+    result = await session.execute(statement, [{"text": note.text, "created_at": created_at} for note in notes_data])
+    ids = list(result.scalars())
+    # commit=False: транзакцию завершает вызывающий (group commit в write_buffer)
+    if commit:
+        await session.commit()
+    return ids
+
 async def get_all_notes(session: AsyncSession):
     result = await session.execute(select(Note))
     return result.scalars().all()
+
+async def get_notes_page(session: AsyncSession, limit: int, after_id: Optional[int] = None):
+    # Keyset по первичному ключу: глубина страницы не влияет на стоимость запроса
+    statement = select(Note).order_by(Note.id).limit(limit + 1)
+    if after_id is not None:
+        statement = statement.where(Note.id > after_id)
+    result = await session.execute(statement)
+    notes = result.scalars().all()
+    return notes[:limit], len(notes) > limit
+
+async def stream_notes(session: AsyncSession, batch_size: int = 500):
+    # Серверный курсор: строки читаются пачками, весь список в памяти не держим
+    statement = select(Note).order_by(Note.id).execution_options(yield_per=batch_size)
+    result = await session.stream(statement)
+    async for note in result.scalars():
+        yield note
@@ -1,11 +1,45 @@
 from sqlmodel import SQLModel
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from fastapi import Request
 from app.config import settings  # <-- импортируем конфиг
+from app.instrumentation import instrument_engine
+from app.replicas import ReplicaRouter, client_key
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True)
+engine = create_async_engine(settings.DATABASE_URL, echo=settings.DB_ECHO)
+# Гистограмма времени по каждому виду SQL-запроса и лог медленных запросов
+instrument_engine(engine, slow_query_seconds=settings.DB_SLOW_QUERY_SECONDS)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Чтения с реплик (если заданы DATABASE_REPLICA_URLS), записи и init_db — только на primary
+replica_engines = [
+    instrument_engine(create_async_engine(url, echo=settings.DB_ECHO), slow_query_seconds=settings.DB_SLOW_QUERY_SECONDS)
+    for url in settings.DATABASE_REPLICA_URLS
+]
+router = ReplicaRouter(
+    engine,
+    replica_engines,
+    strategy=settings.DB_REPLICA_STRATEGY,
+    sticky_seconds=settings.DB_READ_YOUR_WRITES_SECONDS,
+    health_interval=settings.DB_REPLICA_HEALTH_INTERVAL,
+)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+def mark_client_write(request: Request):
+    # Запрос с записью: следующие чтения этого клиента какое-то время идут на primary
+    if request.method not in SAFE_METHODS:
+        router.mark_write(client_key(request))
+
+async def get_session(request: Request):
+    mark_client_write(request)
+    async with router.session() as session:
+        yield session
+
+async def get_read_session(request: Request):
+    async with router.session(read_only=True, key=client_key(request)) as session:
+        yield session
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(SQLModel.metadata.create_all)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import WebSocket
+
+from app.broadcast import RedisBroadcastBackend
+
+logger = logging.getLogger("uvicorn.error")
+
+# Номер события и запись в историю выдаются атомарно вместе с PUBLISH:
+# подписчики всех воркеров видят события строго в порядке seq.
+# Событие приходит без seq ('{...}'), скрипт дописывает его в начало объекта.
+PUBLISH_SCRIPT = """
+local seq = 0
+local messages = {}
+for i = 3, #ARGV do
+    seq = redis.call('INCR', KEYS[1])
+    local message = '{"seq":' .. seq .. ',' .. string.sub(ARGV[i], 2)
+    redis.call('ZADD', KEYS[2], seq, message)
+    messages[#messages + 1] = message
+end
+redis.call('ZREMRANGEBYRANK', KEYS[2], 0, -(tonumber(ARGV[1]) + 1))
+redis.call('PUBLISH', ARGV[2], table.concat(messages, '\\n'))
+return seq
+"""
+
+Event = Tuple[int, str]
+
+
+def event_seq(message: str) -> int:
+    # '{"seq":42,...}' — номер без полного разбора JSON
+    return int(message[7:message.index(",")])
+
+
+class NoteFeed:
+    """Лента изменений заметок: история в Redis (sorted set) + живые события через pub/sub.
+
+    Клиент подключается с ?since=<seq> и получает пропущенные события, затем живые.
+    Если история уже обрезана, приходит {"type": "reset"} — список нужно перечитать.
+    """
+
+    def __init__(self, redis_client, manager, prefix: str = "notes:feed", history: int = 1000):
+        self.redis = redis_client
+        self.manager = manager
+        self.seq_key = f"{prefix}:seq"
+        self.history_key = f"{prefix}:history"
+        self.channel = f"{prefix}:events"
+        self.history = history
+        self.backend = RedisBroadcastBackend(redis_client)
+        self._script = redis_client.register_script(PUBLISH_SCRIPT)
+        # Последний отправленный seq для каждого подписчика
+        self._cursors: Dict[WebSocket, int] = {}
+        # Живые события, пришедшие пока подписчику досылается история
+        self._replaying: Dict[WebSocket, List[Event]] = {}
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+
+    async def publish(self, events: Iterable[str]) -> int:
+        """Публикует JSON-объекты событий одним вызовом скрипта, возвращает последний seq."""
+        args = [self.history, self.channel, *events]
+        if len(args) == 2:
+            return 0
+        return int(await self._script(keys=[self.seq_key, self.history_key], args=args))
+
+    async def read_history(self, since: Optional[int]) -> Tuple[int, List[Event], bool]:
+        """(текущий seq, события после since, нужен ли клиенту полный reset)."""
+        async with self.redis.pipeline() as pipe:
+            pipe.get(self.seq_key)
+            pipe.zrange(self.history_key, 0, 0, withscores=True)
+            pipe.zrangebyscore(self.history_key, f"({since or 0}", "+inf")
+            current, oldest, messages = await pipe.execute()
+        current = int(current or 0)
+        if since is None:
+            return current, [], False
+        oldest_seq = int(oldest[0][1]) if oldest else current + 1
+        if since > current or since < oldest_seq - 1:
+            return current, [], True
+        return current, [(event_seq(message), message) for message in messages], False
+
+    async def subscribe(self, websocket: WebSocket, since: Optional[int] = None):
+        await self.manager.connect(websocket)
+        # Регистрируемся до чтения истории, чтобы не потерять события между ними
+        self._replaying[websocket] = []
+        try:
+            current, events, reset = await self.read_history(since)
+        except Exception:
+            self.unsubscribe(websocket)
+            raise
+        self._cursors[websocket] = since if since is not None and not reset else current
+        hello = {"type": "reset" if reset else "sync", "seq": current}
+        await self.manager.send_personal_message(json.dumps(hello), websocket)
+        for seq, message in events + self._replaying.pop(websocket):
+            self._deliver(websocket, seq, message)
+
+    def unsubscribe(self, websocket: WebSocket):
+        self._cursors.pop(websocket, None)
+        self._replaying.pop(websocket, None)
+        self.manager.disconnect(websocket)
+
+    def _deliver(self, websocket: WebSocket, seq: int, message: str):
+        # Дубликаты (история + живое событие) отсекаются по курсору
+        connection = self.manager.active_connections.get(websocket)
+        if connection is not None and seq > self._cursors.get(websocket, seq):
+            self._cursors[websocket] = seq
+            connection.enqueue(message)
+
+    def _dispatch(self, seq: int, message: str):
+        for replay in self._replaying.values():
+            replay.append((seq, message))
+        for websocket in list(self._cursors):
+            if websocket not in self._replaying:
+                self._deliver(websocket, seq, message)
+
+    async def _catch_up(self):
+        # После переподключения к pub/sub досылаем пропущенное из истории
+        for websocket, cursor in list(self._cursors.items()):
+            current, events, reset = await self.read_history(cursor)
+            if reset:
+                self._cursors[websocket] = current
+                await self.manager.send_personal_message(json.dumps({"type": "reset", "seq": current}), websocket)
+            for seq, message in events:
+                self._deliver(websocket, seq, message)
+
+    async def _listen(self):
+        while True:
+            try:
+                subscription = await self.backend.subscribe(self.channel)
+                if self._subscribed.is_set():
+                    await self._catch_up()
+                self._subscribed.set()
+                async for payload in subscription:
+                    for message in payload.split("\n"):
+                        self._dispatch(event_seq(message), message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Note feed subscription failed, reconnecting")
+                await asyncio.sleep(1)
+
+    async def start(self):
+        self._listener = asyncio.create_task(self._listen())
+        await self._subscribed.wait()
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
@@ -0,0 +1,86 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from passlib.context import CryptContext
+
+# Password hashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def _warmup() -> None:
+    return None
+
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+class PasswordHasher:
+    """bcrypt in a dedicated, size-limited process pool.
+
+    At most ``max_workers + max_queue`` calls may be in flight; beyond that
+    ``HashingPoolSaturated`` is raised immediately instead of queueing, so a
+    login burst fails fast rather than stalling every other request.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = self.max_workers * 4 if max_queue is None else max_queue
+        self.in_flight = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_workers)
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self.in_flight >= self.max_workers + self.max_queue:
+            raise HashingPoolSaturated()
+        self.in_flight += 1
+        try:
+            for attempt in range(2):
+                executor = self.executor
+                try:
+                    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+                except BrokenProcessPool:
+                    # One crashed worker breaks the whole pool: replace it and retry once
+                    self._discard(executor)
+                    if attempt:
+                        raise
+        finally:
+            self.in_flight -= 1
+
+    def _discard(self, executor: ProcessPoolExecutor):
+        # Concurrent calls on the same broken pool replace it only once
+        if self._executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, plain_password, hashed_password)
+
+    async def start(self):
+        # Start the workers up front (before the app opens DB/Redis connections)
+        # so the first logins don't pay for it
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _warmup) for _ in range(self.max_workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._discard(self._executor)
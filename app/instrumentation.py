@@ -0,0 +1,191 @@
+import logging
+import re
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from prometheus_client import Counter, Histogram
+from sqlalchemy import event
+
+# Бакеты под горячий путь: от 100 мкс до секунд
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+DB_QUERY_SECONDS = Histogram(
+    "app_db_query_seconds",
+    "Время выполнения SQL-запроса по его отпечатку",
+    ["statement"],
+    buckets=BUCKETS,
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "app_redis_command_seconds",
+    "Время выполнения команды Redis (включая сеть)",
+    ["command"],
+    buckets=BUCKETS,
+)
+SERIALIZATION_SECONDS = Histogram(
+    "app_serialization_seconds",
+    "Время сериализации ответов и событий",
+    ["operation"],
+    buckets=BUCKETS,
+)
+
+SLOW_QUERIES = Counter(
+    "app_db_slow_queries_total",
+    "SQL-запросы дольше порога медленного запроса",
+    ["statement"],
+)
+REPEATED_QUERIES = Counter(
+    "app_db_repeated_queries_total",
+    "Повторы одного и того же запроса в рамках запроса HTTP (N+1)",
+    ["route", "statement"],
+)
+
+logger = logging.getLogger("app.sql")
+
+_WHITESPACE = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![$\w])\d+\b")
+# Списки параметров разной длины (IN (...), VALUES (...), (...)) сводятся к одному
+_PARAM_LISTS = re.compile(r"\((?:\s*(?:\?|%s|\$\d+|:\w+|%\(\w+\)s)\s*,?)+\)(?:\s*,\s*\((?:\s*(?:\?|%s|\$\d+|:\w+|%\(\w+\)s)\s*,?)+\))*")
+
+MAX_FINGERPRINT_LENGTH = 200
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Нормализованный текст SQL: одна метка на запрос, а не на его параметры."""
+    normalized = _WHITESPACE.sub(" ", statement).strip()
+    normalized = _LITERALS.sub("?", normalized)
+    normalized = _PARAM_LISTS.sub("(...)", normalized)
+    return normalized[:MAX_FINGERPRINT_LENGTH]
+
+
+@lru_cache(maxsize=2048)
+def _query_histogram(statement: str):
+    # labels() на каждый запрос дорог: дочерняя метрика кэшируется вместе с отпечатком
+    return DB_QUERY_SECONDS.labels(fingerprint(statement))
+
+
+class RequestQueries:
+    """Счётчик запросов к БД в рамках одного HTTP-запроса (для поиска N+1)."""
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.counts: Tally = Tally()
+
+    @property
+    def route(self) -> str:
+        # Шаблон маршрута ("/notes/{note_id}") появляется в scope после роутинга
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or self.scope.get("path", "")
+
+
+_request_queries: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+@contextmanager
+def track_queries(scope, repeat_threshold: int):
+    """Считает запросы внутри блока; повторы одного запроса >= repeat_threshold попадают в лог и метрику."""
+    queries = RequestQueries(scope)
+    token = _request_queries.set(queries)
+    try:
+        yield queries
+    finally:
+        _request_queries.reset(token)
+        for statement, count in queries.counts.items():
+            if count >= repeat_threshold:
+                REPEATED_QUERIES.labels(queries.route, statement).inc(count)
+                logger.warning({"event": "repeated_query", "route": queries.route, "statement": statement, "count": count})
+
+
+def _value_shape(value) -> str:
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def bind_shape(parameters, executemany: bool):
+    """Типы параметров без значений: в лог не попадают пользовательские данные."""
+    if executemany:
+        rows = list(parameters)
+        return {"rows": len(rows), "row": bind_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {key: _value_shape(value) for key, value in parameters.items()}
+    return [_value_shape(value) for value in parameters or ()]
+
+
+def instrument_engine(engine, slow_query_seconds: Optional[float] = None):
+    """Гистограмма по отпечатку SQL через события движка (Engine или AsyncEngine).
+
+    Запросы дольше slow_query_seconds пишутся в лог app.sql с формой параметров и маршрутом.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._query_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def observe(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started_at
+        _query_histogram(statement).observe(elapsed)
+        # Контекст запроса доходит и до гринлетов async-движка SQLAlchemy
+        queries = _request_queries.get()
+        if queries is not None:
+            queries.counts[fingerprint(statement)] += 1
+        if slow_query_seconds is not None and elapsed >= slow_query_seconds:
+            SLOW_QUERIES.labels(fingerprint(statement)).inc()
+            logger.warning({
+                "event": "slow_query",
+                "duration": round(elapsed, 4),
+                "statement": fingerprint(statement),
+                "params": bind_shape(parameters, executemany),
+                "route": queries.route if queries is not None else None,
+            })
+
+    return engine
+
+
+def instrument_redis(client):
+    """Оборачивает execute_command и pipeline клиента redis.asyncio (скрипты идут как EVALSHA)."""
+    if getattr(client, "_instrumented", False):
+        return client
+    execute_command = client.execute_command
+    pipeline = client.pipeline
+
+    async def timed_execute_command(*args, **options):
+        started_at = time.perf_counter()
+        try:
+            return await execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(time.perf_counter() - started_at)
+
+    def timed_pipeline(*args, **kwargs):
+        pipe = pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        async def timed_execute(*execute_args, **execute_kwargs):
+            started_at = time.perf_counter()
+            try:
+                return await execute(*execute_args, **execute_kwargs)
+            finally:
+                REDIS_COMMAND_SECONDS.labels("PIPELINE").observe(time.perf_counter() - started_at)
+
+        pipe.execute = timed_execute
+        return pipe
+
+    client.execute_command = timed_execute_command
+    client.pipeline = timed_pipeline
+    client._instrumented = True
+    return client
+
+
+@contextmanager
+def time_serialization(operation: str):
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        SERIALIZATION_SECONDS.labels(operation).observe(time.perf_counter() - started_at)
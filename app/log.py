@@ -0,0 +1,91 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import traceback
+
+# Энкодер собирается один раз; вызывается уже в фоновом потоке записи
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str).encode
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись; dict в msg попадает в "message" как объект."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "message": record.msg if isinstance(record.msg, dict) else record.getMessage(),
+        }
+        if record.exc_info:
+            entry["trace"] = "".join(traceback.format_exception(*record.exc_info))
+        return _encode(entry)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Кладёт запись в очередь без форматирования и никогда не блокирует event loop."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Форматирование (JSON, traceback) выполняет поток QueueListener
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class AsyncLogPipeline:
+    def __init__(self, logger: logging.Logger, stream=None, queue_size: int = 10000):
+        self.logger = logger
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.handler = DroppingQueueHandler(self.queue)
+        self.writer = logging.StreamHandler(stream or sys.stdout)
+        self.writer.setFormatter(JsonFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, self.writer, respect_handler_level=True)
+        self._loggers = [logger]
+        self._running = False
+
+    @property
+    def dropped(self) -> int:
+        return self.handler.dropped
+
+    def attach(self, logger: logging.Logger):
+        # Ещё один логгер пишет через ту же очередь и тот же поток
+        if logger not in self._loggers:
+            self._loggers.append(logger)
+        logger.handlers = [self.handler if self._running else self.writer]
+        logger.propagate = False
+
+    def start(self):
+        if self._running:
+            return
+        self.listener.start()
+        self._running = True
+        for logger in self._loggers:
+            logger.handlers = [self.handler]
+            logger.propagate = False
+
+    def stop(self):
+        # Дописывает всё, что осталось в очереди; дальше логгеры пишут в поток напрямую,
+        # иначе записи после остановки молча пропадали бы в очереди без читателя
+        if not self._running:
+            return
+        self._running = False
+        for logger in self._loggers:
+            logger.handlers = [self.writer]
+        self.listener.stop()
+
+
+def setup_async_logging(logger: logging.Logger, stream=None, queue_size: int = 10000) -> AsyncLogPipeline:
+    pipeline = AsyncLogPipeline(logger, stream=stream, queue_size=queue_size)
+    pipeline.start()
+    atexit.register(pipeline.stop)
+    return pipeline
@@ -0,0 +1,131 @@
+import smtplib
+from contextlib import contextmanager
+from email.message import EmailMessage
+from queue import Empty, Full, LifoQueue
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_SUBJECT = "Уведомление от сервиса заметок"
+DEFAULT_BODY = "Это письмо отправлено сервисом заметок."
+
+# Ошибки соединения: письмо не отправлено, соединение выбрасываем
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+
+
+class SMTPPool:
+    """Пул SMTP-соединений на процесс воркера: пачка писем идёт через одно соединение."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = False,
+        size: int = 2,
+        timeout: float = 10.0,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.size = size
+        # LIFO: чаще используем самое свежее соединение, старые закрываются сервером
+        self._idle: LifoQueue = LifoQueue(maxsize=max(size, 1))
+        self.opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            smtp.starttls()
+        if self.username:
+            smtp.login(self.username, self.password or "")
+        self.opened += 1
+        return smtp
+
+    def _acquire(self) -> smtplib.SMTP:
+        while True:
+            try:
+                smtp = self._idle.get_nowait()
+            except Empty:
+                return self._connect()
+            try:
+                # Соединение могло закрыться по таймауту сервера, пока лежало в пуле
+                if smtp.noop()[0] == 250:
+                    return smtp
+            except CONNECTION_ERRORS:
+                pass
+            self._discard(smtp)
+
+    def _release(self, smtp: smtplib.SMTP):
+        if self.size <= 0:
+            self._discard(smtp)
+            return
+        try:
+            self._idle.put_nowait(smtp)
+        except Full:
+            self._discard(smtp)
+
+    @staticmethod
+    def _discard(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except Exception:
+            smtp.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        smtp = self._acquire()
+        try:
+            yield smtp
+        except BaseException:
+            # Обрыв или любая другая ошибка посреди сессии: состояние соединения неизвестно,
+            # возвращать его в пул нельзя, но слот освобождается
+            self._discard(smtp)
+            raise
+        else:
+            self._release(smtp)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except Empty:
+                return
+
+
+def build_message(sender: str, recipient: str, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+def send_batch(
+    pool: SMTPPool,
+    sender: str,
+    recipients: List[str],
+    subject: str = DEFAULT_SUBJECT,
+    body: str = DEFAULT_BODY,
+    sent: Optional[List[str]] = None,
+    failed: Optional[Dict[str, str]] = None,
+):
+    """Отправляет письма через одно соединение из пула.
+
+    Отказ по конкретному адресу попадает в failed, обрыв соединения пробрасывается:
+    к этому моменту sent/failed уже содержат обработанных получателей.
+    """
+    sent = [] if sent is None else sent
+    failed = {} if failed is None else failed
+    with pool.connection() as smtp:
+        for recipient in recipients:
+            try:
+                smtp.send_message(build_message(sender, recipient, subject, body))
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                failed[recipient] = str(e)
+            else:
+                sent.append(recipient)
+    return sent, failed
@@ -1,21 +1,34 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Request
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Header, Request, Query, HTTPException
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
-from typing import List
-import redis.asyncio as redis
-import json
+from datetime import datetime
+from typing import Iterable, List, Optional
+from pydantic import ValidationError
 import logging
-import time
-import traceback
 import os
+import secrets
 
 from prometheus_fastapi_instrumentator import Instrumentator
 
-from app.websocket import manager
+from app.websocket import ConnectionManager, manager
 from app import crud, models, schemas
-from app.database import async_session, init_db
-from app.tasks import send_email
+from app.database import async_session, get_read_session, get_session, init_db, mark_client_write, router
+from app.replicas import client_key
+from app.pagination import decode_cursor, encode_cursor
+from app.cache import CachedBody, TwoTierCache, etag_matches
+from app.broadcast import Broadcaster, InMemoryBroadcastBackend, RedisBroadcastBackend
+from app.feed import NoteFeed
+from app.write_buffer import NoteWriteBuffer
+from app.task_backend import AsyncioTaskBackend, TaskQueueFull, create_task_backend
+from app.tasks import batch_progress, enqueue_emails, send_email
 from app.middleware.rate_limiter import RateLimiterMiddleware
+from app.middleware.access_log import AccessLogMiddleware
+from app.middleware.query_tracker import QueryTrackerMiddleware
+from app.middleware.admission import AdmissionControlMiddleware, AdmissionController
+from app.log import setup_async_logging
+from app.instrumentation import instrument_redis, time_serialization
+from app.redis_client import create_redis_client
+from app import profiler
 from app.config import settings  # ⬅️ добавлено
 
 app = FastAPI(
@@ -24,40 +37,52 @@ app = FastAPI(
     version="1.0.0"
 )
 
+def prefetch_notes(scope, batcher):
+    # Полный список из кэша читается тем же pipeline, что и проверка лимита
+    if scope["query_string"] or not hasattr(app.state, "notes_cache"):
+        return None
+    return app.state.notes_cache.prefetch(batcher)
+
 # Middleware для ограничения частоты запросов
-app.add_middleware(RateLimiterMiddleware)
+app.add_middleware(RateLimiterMiddleware, prefetch={"GET /notes": prefetch_notes})
 
 # Prometheus метрики
 instrumentator = Instrumentator().instrument(app).expose(app)
 
-# JSON логгер
+# JSON логгер: запись в stdout идёт из фонового потока через очередь
 logger = logging.getLogger("uvicorn.access")
 logger.setLevel(logging.INFO)
-handler = logging.StreamHandler()
-formatter = logging.Formatter('{"time": "%(asctime)s", "level": "%(levelname)s", "message": %(message)s}')
-handler.setFormatter(formatter)
-logger.handlers = [handler]
-
-# Middleware логирования
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    try:
-        response = await call_next(request)
-    except Exception as e:
-        logger.error(json.dumps({
-            "error": str(e),
-            "trace": traceback.format_exc()
-        }))
-        raise
-    process_time = round(time.time() - start_time, 4)
-    logger.info(json.dumps({
-        "method": request.method,
-        "url": request.url.path,
-        "status_code": response.status_code,
-        "duration": process_time
-    }))
-    return response
+log_pipeline = setup_async_logging(logger, queue_size=settings.LOG_QUEUE_SIZE)
+# Медленные запросы и N+1 (логгер app.sql) — туда же
+log_pipeline.attach(logging.getLogger("app.sql"))
+
+# Подсчёт SQL-запросов на каждый HTTP-запрос: повторы одного запроса — признак N+1
+app.add_middleware(QueryTrackerMiddleware, repeat_threshold=settings.DB_REPEATED_QUERY_THRESHOLD)
+
+# Защита от перегрузки: лишние запросы получают 503 до обращения к БД и Redis
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=AdmissionController(
+            initial_limit=settings.ADMISSION_INITIAL_LIMIT,
+            min_limit=settings.ADMISSION_MIN_LIMIT,
+            max_limit=settings.ADMISSION_MAX_LIMIT,
+            max_queue=settings.ADMISSION_QUEUE_SIZE,
+            target_delay=settings.ADMISSION_TARGET_DELAY,
+            interval=settings.ADMISSION_INTERVAL,
+            latency_target=settings.ADMISSION_LATENCY_TARGET,
+        ),
+        route_priorities=settings.ADMISSION_PRIORITIES,
+        retry_after=settings.ADMISSION_RETRY_AFTER,
+    )
+
+# Middleware логирования (чистый ASGI: без лишнего task hop и буферизации тела)
+app.add_middleware(
+    AccessLogMiddleware,
+    logger=logger,
+    sample_rate=settings.ACCESS_LOG_SAMPLE_RATE,
+    slow_threshold=settings.ACCESS_LOG_SLOW_SECONDS,
+)
 
 # Health Check
 @app.get("/health")
@@ -69,46 +94,161 @@ async def health_check():
             return {"status": "ok"}
         return JSONResponse(status_code=500, content={"status": "Redis unavailable"})
     except Exception as e:
-        logger.error(json.dumps({
-            "error": "Health check failed",
-            "trace": traceback.format_exc()
-        }))
+        logger.error({"error": "Health check failed"}, exc_info=True)
         return JSONResponse(status_code=500, content={"error": "Internal Server Error"})
 
 @app.on_event("startup")
 async def on_startup():
+    # После shutdown (повторный запуск в том же процессе) логи снова идут через очередь
+    log_pipeline.start()
     await init_db()
     try:
-        app.state.redis = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        # Один клиент и один пул соединений на процесс (pub/sub ленты и рассылки держат по соединению)
+        app.state.redis = instrument_redis(create_redis_client(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            pool_timeout=settings.REDIS_POOL_TIMEOUT,
+        ))
         await app.state.redis.ping()
+        app.state.notes_cache = TwoTierCache(
+            "notes",
+            app.state.redis,
+            ttl=settings.NOTES_CACHE_TTL,
+            local_ttl=settings.NOTES_LOCAL_CACHE_TTL,
+            local_maxsize=settings.NOTES_LOCAL_CACHE_SIZE,
+            dumps=CachedBody.dumps,
+            loads=CachedBody.loads,
+        )
         logger.info("✅ Redis connected successfully")
     except Exception as e:
-        logger.error(json.dumps({
-            "error": "Failed to connect to Redis during startup",
-            "trace": traceback.format_exc()
-        }))
+        logger.error({"error": "Failed to connect to Redis during startup"}, exc_info=True)
         raise
 
+    # Рассылка /ws между воркерами через Redis pub/sub
+    if settings.BROADCAST_BACKEND == "redis":
+        backend = RedisBroadcastBackend(app.state.redis)
+    else:
+        backend = InMemoryBroadcastBackend()
+    app.state.broadcaster = Broadcaster(backend, manager, flush_interval=settings.BROADCAST_FLUSH_INTERVAL)
+    await app.state.broadcaster.start()
+
+    # Лента изменений заметок (/ws/notes) вместо опроса GET /notes
+    feed_manager = ConnectionManager(max_queue=settings.WS_SEND_QUEUE_SIZE, policy=settings.WS_SLOW_CONSUMER_POLICY)
+    app.state.note_feed = NoteFeed(app.state.redis, feed_manager, history=settings.NOTES_FEED_HISTORY)
+    await app.state.note_feed.start()
+
+    # Лёгкие задачи: брокер Celery или пул воркеров прямо в процессе
+    options = {}
+    if settings.TASK_BACKEND == AsyncioTaskBackend.name:
+        options = dict(
+            concurrency=settings.TASK_CONCURRENCY,
+            max_queue=settings.TASK_QUEUE_SIZE,
+            max_retries=settings.TASK_MAX_RETRIES,
+            retry_delay=settings.TASK_RETRY_DELAY,
+        )
+    app.state.tasks = create_task_backend(settings.TASK_BACKEND, **options)
+    await app.state.tasks.start()
+
+    # Фоновая проверка реплик чтения (если они заданы)
+    await router.start()
+
+    # POST /notes пачками в одной транзакции (group commit); по умолчанию выключено
+    app.state.note_writer = None
+    if settings.NOTES_WRITE_BUFFER:
+        app.state.note_writer = NoteWriteBuffer(
+            async_session,
+            max_rows=settings.NOTES_WRITE_BUFFER_MAX_ROWS,
+            max_delay=settings.NOTES_WRITE_BUFFER_MAX_DELAY,
+            durability=settings.NOTES_WRITE_BUFFER_DURABILITY,
+            on_commit=notes_committed,
+        )
+        await app.state.note_writer.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Дописываем принятые заметки и дожидаемся уже поставленных задач до закрытия остальных ресурсов
+    if app.state.note_writer is not None:
+        await app.state.note_writer.stop()
+    await app.state.tasks.stop(timeout=settings.TASK_DRAIN_TIMEOUT)
+    await app.state.note_feed.stop()
+    await app.state.broadcaster.stop()
+    await app.state.redis.aclose()
+    await router.stop()
+    log_pipeline.stop()
+
 @app.get(
     "/notes",
     response_model=List[schemas.NoteOut],
     summary="Получить список заметок",
-    description="Возвращает кэшированный или свежий список всех заметок из базы данных.",
+    description=(
+        "Возвращает кэшированный или свежий список всех заметок из базы данных. Поддерживает ETag / If-None-Match. "
+        "С параметрами limit/cursor отдаёт страницу (keyset по id), курсор следующей страницы — в заголовке X-Next-Cursor."
+    ),
     tags=["Заметки"],
     responses={
         200: {"description": "Успешный ответ со списком заметок"},
+        304: {"description": "Список не изменился с указанного ETag"},
+        400: {"description": "Неверный курсор"},
         500: {"description": "Внутренняя ошибка сервера"},
     }
 )
-async def get_notes(session: AsyncSession = Depends(async_session)):
-    redis_client = app.state.redis
-    cache_key = "notes_cache"
-    cached_data = await redis_client.get(cache_key)
-    if cached_data:
-        return json.loads(cached_data)
-    notes = await crud.get_notes(session)
-    await redis_client.set(cache_key, json.dumps([note.model_dump() for note in notes]), ex=60)
-    return notes
+async def get_notes(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=settings.NOTES_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(get_read_session),
+):
+    if limit is not None or cursor is not None:
+        return await notes_page_response(session, limit or settings.NOTES_PAGE_DEFAULT_LIMIT, cursor)
+
+    async def load_notes():
+        # Общий кэш заполняем с primary: отстающая реплика сохранила бы старый список
+        # под новой версией ключа для всех воркеров на весь TTL
+        async with router.session() as primary:
+            notes = await crud.get_all_notes(primary)
+        adapter = schemas.notes_list_adapter
+        with time_serialization("notes_list"):
+            return CachedBody.from_bytes(adapter.dump_json(adapter.validate_python(notes, from_attributes=True)))
+
+    # Готовые байты из кэша отдаём как есть, минуя response_model
+    prefetched = getattr(request.state, "redis_prefetch", None)
+    cached = await app.state.notes_cache.get_or_load(load_notes, prefetched=prefetched)
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+async def notes_page_response(session: AsyncSession, limit: int, cursor: Optional[str]):
+    try:
+        after_id = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    notes, has_more = await crud.get_notes_page(session, limit, after_id)
+    adapter = schemas.notes_list_adapter
+    headers = {}
+    if has_more:
+        headers["X-Next-Cursor"] = encode_cursor(notes[-1].id)
+    with time_serialization("notes_page"):
+        content = adapter.dump_json(adapter.validate_python(notes, from_attributes=True))
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@app.get(
+    "/notes/stream",
+    summary="Потоковая выгрузка заметок (NDJSON)",
+    description="Отдаёт все заметки построчно в формате application/x-ndjson, читая их из базы серверным курсором.",
+    tags=["Заметки"],
+    response_class=StreamingResponse,
+)
+async def stream_notes(request: Request):
+    key = client_key(request)
+
+    async def ndjson():
+        # Собственная сессия: она должна жить, пока отдаётся тело ответа
+        async with router.session(read_only=True, key=key) as session:
+            async for note in crud.stream_notes(session, settings.NOTES_STREAM_BATCH_SIZE):
+                yield schemas.NoteOut.model_validate(note, from_attributes=True).model_dump_json().encode() + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 @app.post(
     "/notes",
@@ -120,34 +260,203 @@ async def get_notes(session: AsyncSession = Depends(async_session)):
         400: {"description": "Неверные данные"},
     }
 )
-async def add_note(note: schemas.NoteCreate, session: AsyncSession = Depends(async_session)):
-    new_note = await crud.create_note(session, note)
-    await app.state.redis.delete("notes_cache")
+async def add_note(note: schemas.NoteCreate, request: Request):
+    mark_client_write(request)
+    if app.state.note_writer is not None:
+        # Group commit: инвалидация кэша и лента — один раз на пачку (notes_committed); своя сессия запросу не нужна
+        return await app.state.note_writer.submit(note)
+    async with router.session() as session:
+        new_note = await crud.create_note(session, note)
+    # Версионирование вместо удаления ключа: без лавины промахов после записи
+    await app.state.notes_cache.invalidate()
+    await publish_note_events("note.created", [new_note])
     return new_note
 
+async def notes_committed(notes: List[models.Note]):
+    await app.state.notes_cache.invalidate()
+    await publish_note_events("note.created", notes)
+
+async def publish_note_events(event_type: str, notes: Iterable):
+    with time_serialization("note_events"):
+        events = [
+            '{"type":"%s","note":%s}' % (event_type, schemas.NoteOut.model_validate(note, from_attributes=True).model_dump_json())
+            for note in notes
+        ]
+    try:
+        await app.state.note_feed.publish(events)
+    except Exception:
+        # Заметка уже сохранена: сбой ленты не должен ломать запись
+        logger.error({"error": "Failed to publish note events"}, exc_info=True)
+
+async def ndjson_notes(request: Request):
+    buffer = b""
+    line_number = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, line
+    if buffer.strip():
+        yield line_number + 1, buffer
+
+async def insert_notes_batch(session: AsyncSession, batch: List[schemas.NoteCreate]) -> List[int]:
+    created_at = datetime.utcnow()
+    ids = await crud.bulk_create_notes(session, batch, created_at)
+    # Одна инвалидация и один вызов ленты на пачку, а не на каждую заметку
+    await app.state.notes_cache.invalidate()
+    await publish_note_events(
+        "note.created",
+        (schemas.NoteOut(id=note_id, text=note.text, created_at=created_at) for note_id, note in zip(ids, batch)),
+    )
+    return ids
+
+@app.post(
+    "/notes/bulk",
+    response_model=schemas.BulkNotesOut,
+    summary="Массовое добавление заметок",
+    description=(
+        "Принимает JSON-массив заметок или поток application/x-ndjson (одна заметка на строку). "
+        "Заметки вставляются пачками по NOTES_BULK_BATCH_SIZE, кэш сбрасывается один раз на пачку."
+    ),
+    tags=["Заметки"],
+    responses={
+        200: {"description": "Заметки созданы, возвращены их идентификаторы"},
+        422: {"description": "Неверные данные (для NDJSON — с номером строки)"},
+    }
+)
+async def add_notes_bulk(request: Request, session: AsyncSession = Depends(get_session)):
+    batch_size = settings.NOTES_BULK_BATCH_SIZE
+    ids: List[int] = []
+
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        batch: List[schemas.NoteCreate] = []
+        async for line_number, line in ndjson_notes(request):
+            try:
+                batch.append(schemas.NoteCreate.model_validate_json(line))
+            except ValidationError as e:
+                raise HTTPException(
+                    status_code=422,
+                    detail={"line": line_number, "inserted_ids": ids, "errors": e.errors(include_url=False, include_input=False)},
+                )
+            if len(batch) >= batch_size:
+                ids += await insert_notes_batch(session, batch)
+                batch = []
+        ids += await insert_notes_batch(session, batch) if batch else []
+    else:
+        try:
+            notes = schemas.notes_create_adapter.validate_json(await request.body())
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+        for start in range(0, len(notes), batch_size):
+            ids += await insert_notes_batch(session, notes[start:start + batch_size])
+
+    return {"ids": ids, "count": len(ids)}
+
 @app.get(
     "/send-email/",
-    summary="Отправить email через Celery",
-    description="Добавляет задачу отправки письма в очередь Celery",
-    tags=["Почта"]
+    summary="Отправить email в фоне",
+    description="Добавляет задачу отправки письма в очередь (Celery или пул в процессе, см. TASK_BACKEND)",
+    tags=["Почта"],
+    responses={503: {"description": "Очередь фоновых задач переполнена"}},
 )
 async def trigger_email(email: str):
-    task = send_email.delay(email)
+    try:
+        task_id = await app.state.tasks.submit(send_email, email)
+    except TaskQueueFull:
+        raise HTTPException(status_code=503, detail="Очередь задач переполнена", headers={"Retry-After": "1"})
     return {
         "message": f"Задача на отправку письма на {email} отправлена в очередь",
-        "task_id": task.id
+        "task_id": task_id
     }
 
+@app.post(
+    "/send-email/bulk",
+    response_model=schemas.BulkEmailOut,
+    summary="Массовая рассылка через Celery",
+    description="Делит получателей на пачки по EMAIL_BATCH_SIZE: одна задача и одно SMTP-соединение на пачку.",
+    tags=["Почта"]
+)
+def trigger_bulk_email(payload: schemas.BulkEmailIn):
+    options = payload.model_dump(exclude_none=True, exclude={"emails"})
+    result = enqueue_emails(payload.emails, **options)
+    return {"group_id": result.id, "batches": len(result.results), "recipients": len(set(payload.emails))}
+
+@app.get(
+    "/send-email/bulk/{group_id}",
+    response_model=schemas.BulkEmailProgress,
+    summary="Прогресс массовой рассылки",
+    tags=["Почта"],
+    responses={404: {"description": "Рассылка не найдена"}},
+)
+def bulk_email_progress(group_id: str):
+    progress = batch_progress(group_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Рассылка не найдена")
+    return progress
+
+@app.get(
+    "/admin/profile",
+    summary="Профилирование процесса или маршрута",
+    description=(
+        "Сэмплирующий профайлер на seconds секунд без перезапуска. С route (и method) остаются только стеки, "
+        "проходящие через обработчик этого маршрута. Результат — speedscope JSON или collapsed для flamegraph. "
+        "Требует заголовок X-Profiler-Token, равный PROFILER_TOKEN."
+    ),
+    tags=["Диагностика"],
+    responses={
+        403: {"description": "Неверный токен"},
+        404: {"description": "Профайлер выключен или маршрут не найден"},
+        409: {"description": "Уже идёт другой сеанс профилирования"},
+    },
+)
+async def profile_endpoint(
+    seconds: float = Query(10, gt=0, le=settings.PROFILER_MAX_SECONDS),
+    route: Optional[str] = None,
+    method: Optional[str] = None,
+    interval: float = Query(0.005, ge=0.001, le=0.1),
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    all_threads: bool = False,
+    x_profiler_token: Optional[str] = Header(None),
+):
+    if not settings.PROFILER_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_profiler_token or not secrets.compare_digest(x_profiler_token, settings.PROFILER_TOKEN):
+        raise HTTPException(status_code=403, detail="Неверный токен профайлера")
+    codes = None
+    if route:
+        codes = profiler.route_codes(app, route, method)
+        if not codes:
+            raise HTTPException(status_code=404, detail="Маршрут не найден")
+    try:
+        result = await profiler.profile(seconds, interval, codes, all_threads)
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="Профилирование уже идёт")
+    content, media_type = profiler.render(result, format, f"{method or ''} {route or 'process'}".strip())
+    return Response(content=content, media_type=media_type)
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(f"📨 Сообщение: {data}")
+            await app.state.broadcaster.publish(f"📨 Сообщение: {data}")
     except WebSocketDisconnect:
         manager.disconnect(websocket)
-        await manager.broadcast("❌ Кто-то отключился")
+        await app.state.broadcaster.publish("❌ Кто-то отключился")
+
+@app.websocket("/ws/notes")
+async def notes_feed(websocket: WebSocket, since: Optional[int] = None):
+    # Сначала {"type": "sync"|"reset", "seq": N}, затем события {"seq", "type", "note"}
+    feed = app.state.note_feed
+    await feed.subscribe(websocket, since)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        feed.unsubscribe(websocket)
 
 @app.get("/test", response_class=HTMLResponse, include_in_schema=False)
 async def websocket_test_page():
@@ -0,0 +1,48 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+import logging
+import random
+import time
+
+
+class AccessLogMiddleware:
+    # Ошибки (5xx, исключения) и медленные запросы пишутся всегда, успешные — с вероятностью sample_rate
+    def __init__(self, app: ASGIApp, logger: logging.Logger, sample_rate: float = 1.0, slow_threshold: float = 1.0):
+        self.app = app
+        self.logger = logger
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as e:
+            # traceback форматирует поток записи логов, а не event loop
+            self.logger.error({
+                "method": scope["method"],
+                "url": scope["path"],
+                "error": str(e),
+                "duration": round(time.perf_counter() - start_time, 4),
+            }, exc_info=True)
+            raise
+        process_time = time.perf_counter() - start_time
+        if status_code < 500 and process_time < self.slow_threshold and random.random() >= self.sample_rate:
+            return
+        self.logger.info({
+            "method": scope["method"],
+            "url": scope["path"],
+            "status_code": status_code,
+            "duration": round(process_time, 4),
+        })
@@ -0,0 +1,225 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Dict, Mapping, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.routes import match_route, sort_routes
+
+# critical проходят без очереди (health-check, метрики), high обслуживаются раньше normal
+CRITICAL, HIGH, NORMAL = "critical", "high", "normal"
+PRIORITIES = (HIGH, NORMAL)
+
+ADMISSION_LIMIT = Gauge("app_admission_limit", "Текущий адаптивный лимит одновременных запросов")
+ADMISSION_IN_FLIGHT = Gauge("app_admission_in_flight", "Запросы, выполняющиеся прямо сейчас")
+ADMISSION_QUEUE_DELAY = Histogram(
+    "app_admission_queue_delay_seconds",
+    "Ожидание запроса в очереди перед выполнением",
+    ["priority"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+ADMISSION_REJECTED = Counter(
+    "app_admission_rejected_total",
+    "Запросы, отклонённые с 503: queue_full, timeout, evicted",
+    ["priority", "reason"],
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """Адаптивный лимит одновременных запросов (AIMD) с очередью в стиле CoDel.
+
+    Лимит растёт на 1 за каждые limit быстрых запросов, пока он упирается в потолок,
+    и умножается на backoff (не чаще раза в interval), когда запросы медленнее
+    latency_target или ждут в очереди слишком долго. Очередь ждёт до interval,
+    но если она не опустошалась дольше interval — только target_delay: при стойкой
+    перегрузке лишние запросы получают отказ сразу, а не после таймаута клиента.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        max_queue: int = 100,
+        target_delay: float = 0.05,
+        interval: float = 0.5,
+        latency_target: float = 1.0,
+        backoff: float = 0.9,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.max_queue = max_queue
+        self.target_delay = target_delay
+        self.interval = interval
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._waiters: Dict[str, deque] = {priority: deque() for priority in PRIORITIES}
+        self._queue_empty_at = time.monotonic()
+        self._decreased_at = 0.0
+        ADMISSION_LIMIT.set(self.limit)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _overloaded(self, now: float) -> bool:
+        return self.queued > 0 and now - self._queue_empty_at > self.interval
+
+    async def acquire(self, priority: str = NORMAL) -> float:
+        """Занимает слот; возвращает время ожидания в очереди или бросает Overloaded."""
+        ahead = self._waiters[HIGH] if priority == NORMAL else ()
+        if self._has_capacity() and not self._waiters[priority] and not ahead:
+            self._take()
+            return 0.0
+
+        if self.queued >= self.max_queue:
+            # Важный запрос вытесняет самый новый обычный
+            if priority != HIGH or not self._waiters[NORMAL]:
+                raise Overloaded("queue_full")
+            evicted = self._waiters[NORMAL].pop()
+            evicted.set_exception(Overloaded("evicted"))
+
+        now = time.monotonic()
+        timeout = self.target_delay if self._overloaded(now) else self.interval
+        if self.queued == 0:
+            self._queue_empty_at = now
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._decrease(time.monotonic())
+            raise Overloaded("timeout")
+        except asyncio.CancelledError:
+            # Клиент ушёл, а слот уже был выдан: возвращаем его следующему
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.in_flight -= 1
+                ADMISSION_IN_FLIGHT.set(self.in_flight)
+                self._wake()
+            raise
+        finally:
+            if future in self._waiters[priority]:
+                self._waiters[priority].remove(future)
+            self._mark_if_empty()
+        return time.monotonic() - now
+
+    def _take(self):
+        self.in_flight += 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+
+    def _mark_if_empty(self):
+        if self.queued == 0:
+            self._queue_empty_at = time.monotonic()
+
+    def release(self, latency: float):
+        saturated = self.in_flight >= int(self.limit) or self.queued > 0
+        self.in_flight -= 1
+        ADMISSION_IN_FLIGHT.set(self.in_flight)
+        if latency > self.latency_target:
+            self._decrease(time.monotonic())
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            ADMISSION_LIMIT.set(self.limit)
+        self._wake()
+
+    def _decrease(self, now: float):
+        if now - self._decreased_at < self.interval:
+            return
+        self._decreased_at = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        ADMISSION_LIMIT.set(self.limit)
+
+    def _wake(self):
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters and self._has_capacity():
+                future = waiters.popleft()
+                if not future.done():
+                    self._take()
+                    future.set_result(None)
+        self._mark_if_empty()
+
+
+def default_priority(scope: Scope) -> str:
+    # Запись от авторизованного клиента важнее анонимного чтения
+    if scope["method"] not in ("GET", "HEAD", "OPTIONS"):
+        for name, _ in scope["headers"]:
+            if name == b"authorization":
+                return HIGH
+    return NORMAL
+
+
+class AdmissionControlMiddleware:
+    # Ограничивает одновременные запросы по нагрузке на сервер, а не по IP: лишние получают 503 заранее
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: Optional[AdmissionController] = None,
+        route_priorities: Optional[Mapping[str, str]] = None,
+        priority_func: Callable[[Scope], str] = default_priority,
+        retry_after: int = 1,
+    ):
+        self.app = app
+        self.controller = controller or AdmissionController()
+        # "/health" или "POST /notes"; как и в RateLimiterMiddleware, побеждает самый длинный префикс
+        self.route_priorities = sort_routes(route_priorities or {})
+        self.priority_func = priority_func
+        self.retry_after = retry_after
+
+    def resolve_priority(self, scope: Scope) -> str:
+        matched = match_route(self.route_priorities, scope["method"], scope["path"])
+        if matched is not None:
+            return matched[1]
+        return self.priority_func(scope)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority = self.resolve_priority(scope)
+        if priority == CRITICAL:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            delay = await self.controller.acquire(priority)
+        except Overloaded as exc:
+            ADMISSION_REJECTED.labels(priority, exc.reason).inc()
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server is overloaded. Please try again later."},
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        ADMISSION_QUEUE_DELAY.labels(priority).observe(delay)
+        started_at = time.perf_counter()
+        latency = None
+
+        async def send_and_time(message: Message):
+            nonlocal latency
+            # Сигнал нагрузки — время до заголовков: долгий стриминг тела не считается медленным запросом
+            if message["type"] == "http.response.start":
+                latency = time.perf_counter() - started_at
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_time)
+        finally:
+            self.controller.release(latency if latency is not None else time.perf_counter() - started_at)
@@ -0,0 +1,17 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.instrumentation import track_queries
+
+
+class QueryTrackerMiddleware:
+    # Считает SQL-запросы каждого HTTP-запроса: повтор одного запроса repeat_threshold раз — признак N+1
+    def __init__(self, app: ASGIApp, repeat_threshold: int = 10):
+        self.app = app
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with track_queries(scope, self.repeat_threshold):
+            await self.app(scope, receive, send)
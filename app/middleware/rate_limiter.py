@@ -1,46 +1,241 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from fastapi import Request
+from starlette.datastructures import MutableHeaders
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from app.config import settings
+from app.middleware.routes import match_route, sort_routes
+from app.redis_client import RedisBatcher
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional
+import math
+import os
 import time
 import logging
 
 logger = logging.getLogger("uvicorn.error")
 
-class RateLimiterMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
-        self.requests = settings.RATE_LIMIT_REQUESTS
-        self.window = settings.RATE_LIMIT_SECONDS
+# Каждый алгоритм — один Lua-скрипт: проверка и изменение счётчика атомарно и за один round trip.
+# Все скрипты возвращают {allowed, remaining, reset_ms}.
 
-    async def dispatch(self, request: Request, call_next):
-        try:
-            redis_client = getattr(request.app.state, "redis", None)
-            if not redis_client:
-                logger.warning("Redis client is not initialized. Skipping rate limit.")
-                return await call_next(request)
+FIXED_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local current = redis.call('INCR', KEYS[1])
+if current == 1 then
+    redis.call('PEXPIRE', KEYS[1], window)
+end
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then
+    redis.call('PEXPIRE', KEYS[1], window)
+    ttl = window
+end
+if current > limit then
+    return {0, 0, ttl}
+end
+return {1, limit - current, ttl}
+"""
 
-            client_ip = request.client.host
-            key = f"ratelimit:{client_ip}"
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], window)
+    count = count + 1
+    allowed = 1
+end
+local reset = window
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+if oldest[2] then
+    reset = tonumber(oldest[2]) + window - now
+end
+return {allowed, limit - count, reset}
+"""
 
-            current_time = int(time.time())
-            window_start = current_time - (current_time % self.window)
-            redis_key = f"{key}:{window_start}"
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2]) / tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate))
+local reset
+if allowed == 1 then
+    reset = math.ceil((capacity - tokens) / rate)
+else
+    reset = math.ceil((1 - tokens) / rate)
+end
+return {allowed, math.floor(tokens), reset}
+"""
+
+SCRIPTS = {
+    "fixed_window": FIXED_WINDOW_SCRIPT,
+    "sliding_window": SLIDING_WINDOW_SCRIPT,
+    "token_bucket": TOKEN_BUCKET_SCRIPT,
+}
+
+
+@dataclass(frozen=True)
+class RateLimitRule:
+    limit: int
+    window: int
+    algorithm: str = "fixed_window"
+
+    def __post_init__(self):
+        if self.algorithm not in SCRIPTS:
+            raise ValueError(f"Unknown rate limit algorithm: {self.algorithm}")
+
+    @classmethod
+    def parse(cls, value: str, default_algorithm: str = "fixed_window") -> "RateLimitRule":
+        # "10/60" или "10/60/token_bucket"
+        parts = value.split("/")
+        algorithm = parts[2] if len(parts) > 2 else default_algorithm
+        return cls(limit=int(parts[0]), window=int(parts[1]), algorithm=algorithm)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_ms: int
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        reset = str(max(0, math.ceil(self.reset_ms / 1000)))
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(max(0, self.remaining)),
+            "RateLimit-Reset": reset,
+        }
+        if not self.allowed:
+            headers["Retry-After"] = reset
+        return headers
+
+
+class RateLimiter:
+    def __init__(self):
+        self._scripts = {}
+
+    def _script(self, redis_client, algorithm: str):
+        script = self._scripts.get(algorithm)
+        if script is None:
+            script = self._scripts[algorithm] = redis_client.register_script(SCRIPTS[algorithm])
+        return script
+
+    async def hit(self, redis_client, key: str, rule: RateLimitRule, batcher: Optional[RedisBatcher] = None) -> RateLimitResult:
+        window_ms = rule.window * 1000
+        now_ms = int(time.time() * 1000)
+        if rule.algorithm == "fixed_window":
+            args = [rule.limit, window_ms]
+        elif rule.algorithm == "sliding_window":
+            args = [rule.limit, window_ms, now_ms, f"{now_ms}-{os.urandom(4).hex()}"]
+        else:
+            args = [rule.limit, rule.limit, window_ms, now_ms]
+        script = self._script(redis_client, rule.algorithm)
+        if batcher is not None:
+            allowed, remaining, reset_ms = await batcher.script(script, [key], args)
+        else:
+            allowed, remaining, reset_ms = await script(keys=[key], args=args, client=redis_client)
+        return RateLimitResult(bool(allowed), rule.limit, int(remaining), int(reset_ms))
 
-            current = await redis_client.get(redis_key)
-            if current is None:
-                await redis_client.set(redis_key, 1, ex=self.window)
-            elif int(current) < self.requests:
-                await redis_client.incr(redis_key)
-            else:
-                return JSONResponse(
-                    status_code=429,
-                    content={"detail": "Too many requests. Please try again later."}
-                )
 
+def client_ip(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class RateLimiterMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        default_rule: Optional[RateLimitRule] = None,
+        route_rules: Optional[Mapping[str, RateLimitRule]] = None,
+        key_rules: Optional[Mapping[str, RateLimitRule]] = None,
+        key_func: Callable[[Scope], str] = client_ip,
+        prefetch: Optional[Mapping[str, Callable[[Scope, RedisBatcher], Any]]] = None,
+    ):
+        self.app = app
+        self.default_rule = default_rule or RateLimitRule(
+            settings.RATE_LIMIT_REQUESTS, settings.RATE_LIMIT_SECONDS, settings.RATE_LIMIT_ALGORITHM
+        )
+        if route_rules is None:
+            route_rules = {
+                route: RateLimitRule.parse(value, settings.RATE_LIMIT_ALGORITHM)
+                for route, value in settings.RATE_LIMIT_ROUTES.items()
+            }
+        # Правила вида "/notes" или "POST /notes"; побеждает самый длинный префикс
+        self.route_rules = sort_routes(route_rules)
+        self.key_rules = dict(key_rules or {})
+        self.key_func = key_func
+        # "GET /notes" -> функция, ставящая чтение кэша в тот же pipeline, что и проверка лимита
+        self.prefetch = dict(prefetch or {})
+        self.limiter = RateLimiter()
+        self._rule_cache: Dict[tuple, tuple] = {}
+
+    def resolve_rule(self, method: str, path: str) -> tuple:
+        cached = self._rule_cache.get((method, path))
+        if cached is not None:
+            return cached
+        resolved = match_route(self.route_rules, method, path) or ("*", self.default_rule)
+        if len(self._rule_cache) < 1024:
+            self._rule_cache[(method, path)] = resolved
+        return resolved
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        result = None
+        try:
+            redis_client = getattr(scope["app"].state, "redis", None)
+            if redis_client:
+                identity = self.key_func(scope)
+                route, rule = self.resolve_rule(scope["method"], scope["path"])
+                rule = self.key_rules.get(identity, rule)
+                key = f"ratelimit:{rule.algorithm}:{route}:{identity}"
+                batcher = RedisBatcher(redis_client)
+                prefetch = self.prefetch.get(f"{scope['method']} {scope['path']}")
+                if prefetch is not None:
+                    scope.setdefault("state", {})["redis_prefetch"] = prefetch(scope, batcher)
+                result = await self.limiter.hit(redis_client, key, rule, batcher)
+            else:
+                logger.warning("Redis client is not initialized. Skipping rate limit.")
         except Exception as e:
-            logger.error(f"RateLimiterMiddleware error: {e}")
             # Не мешаем работе приложения
-            return await call_next(request)
+            logger.error(f"RateLimiterMiddleware error: {e}")
+
+        if result is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not result.allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": "Too many requests. Please try again later."},
+                headers=result.headers,
+            )
+            await response(scope, receive, send)
+            return
+
+        limit_headers = result.headers
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in limit_headers.items():
+                    headers.append(name, value)
+            await send(message)
 
-        return await call_next(request)
+        await self.app(scope, receive, send_with_headers)
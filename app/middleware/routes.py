@@ -0,0 +1,19 @@
+from typing import List, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+def sort_routes(routes: Mapping[str, T]) -> List[Tuple[str, T]]:
+    # Ключи вида "/notes" или "POST /notes"; длинные пути первыми, чтобы побеждал самый длинный префикс
+    return sorted(routes.items(), key=lambda item: len(item[0].split(" ")[-1]), reverse=True)
+
+
+def match_route(routes: List[Tuple[str, T]], method: str, path: str) -> Optional[Tuple[str, T]]:
+    """Первое правило из sort_routes, подходящее запросу: (ключ, значение) или None."""
+    for route, value in routes:
+        route_method, _, route_path = route.rpartition(" ")
+        if route_method and route_method != method:
+            continue
+        if path == route_path or path.startswith(route_path.rstrip("/") + "/"):
+            return route, value
+    return None
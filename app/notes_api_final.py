@@ -1,37 +1,127 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.openapi.utils import get_openapi
-from sqlmodel import SQLModel, Field, Session, create_engine, select
-from pydantic import BaseModel
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import registry, sessionmaker
+from sqlmodel import SQLModel, Field, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from pydantic import BaseModel, TypeAdapter
+from typing import Literal, Optional, List
+from concurrent.futures.process import BrokenProcessPool
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
+import logging
 import os
+import redis.asyncio as redis
+
+from app.auth_cache import PrincipalCache
+from app.hashing import HashingPoolSaturated, PasswordHasher
+from app.instrumentation import instrument_engine, instrument_redis, time_serialization
+from app.log import setup_async_logging
+from app.middleware.query_tracker import QueryTrackerMiddleware
+from app import profiler
+from app.pagination import decode_cursor, encode_cursor
+from app.replicas import ReplicaRouter, client_key
+from app.response_cache import ResponseCache
+from app.search import apply_search, install_search
 
 # JWT Config
 SECRET_KEY = "supersecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: bcrypt runs in its own bounded process pool, not the shared threadpool
+hasher = PasswordHasher(
+    max_workers=int(os.getenv("HASH_POOL_WORKERS", "0")) or None,
+    max_queue=int(os.getenv("HASH_POOL_MAX_QUEUE")) if os.getenv("HASH_POOL_MAX_QUEUE") else None,
+)
+
+logger = logging.getLogger("uvicorn.error")
 
 # OAuth2 token scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login", auto_error=False)
 
-# Database setup
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///default.db")
-engine = create_engine(DATABASE_URL, echo=True)
+# Principal cache: skips the per-request user lookup; Redis backing is optional
+REDIS_URL = os.getenv("NOTES_REDIS_URL")
+# Role claims in issued tokens are trusted only while revocations are shared between workers (Redis):
+# otherwise a demoted user keeps the old role on every worker but the one that handled the change
+TRUST_TOKEN_CLAIMS = os.getenv("TRUST_TOKEN_CLAIMS", "true" if REDIS_URL else "false").lower() == "true"
+if TRUST_TOKEN_CLAIMS and not REDIS_URL:
+    logger.warning("TRUST_TOKEN_CLAIMS needs NOTES_REDIS_URL for shared revocations; token claims will not be trusted")
+    TRUST_TOKEN_CLAIMS = False
+principal_cache = PrincipalCache(
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "30")),
+    maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000")),
+    revocation_ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
 
-# Models
-class User(SQLModel, table=True):
+# Database setup
+def async_database_url(url: str) -> str:
+    # Accept plain sync URLs from older deployments and pick the async driver
+    for sync_prefix, async_prefix in (("sqlite://", "sqlite+aiosqlite://"), ("postgresql://", "postgresql+asyncpg://")):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+def engine_options(url: str) -> dict:
+    options = {
+        "echo": os.getenv("NOTES_DB_ECHO", "false").lower() == "true",
+        "pool_pre_ping": os.getenv("NOTES_DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    if not url.startswith("sqlite"):
+        options["pool_size"] = int(os.getenv("NOTES_DB_POOL_SIZE", "10"))
+        options["max_overflow"] = int(os.getenv("NOTES_DB_MAX_OVERFLOW", "20"))
+        options["pool_timeout"] = float(os.getenv("NOTES_DB_POOL_TIMEOUT", "30"))
+    return options
+
+DATABASE_URL = async_database_url(os.getenv("DATABASE_URL", "sqlite:///default.db"))
+# Slow statements are logged to "app.sql" with their bind shape and route instead of echoing everything;
+# the records are written by the log pipeline's thread, not on the event loop
+sql_log_pipeline = setup_async_logging(logging.getLogger("app.sql"), queue_size=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+engine = instrument_engine(
+    create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL)),
+    slow_query_seconds=float(os.getenv("NOTES_DB_SLOW_QUERY_SECONDS", "0.2")),
+)
+async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Read replicas for note reads (comma-separated URLs); writes, auth and table creation stay on the primary
+REPLICA_URLS = [url.strip() for url in os.getenv("NOTES_DB_REPLICA_URLS", "").split(",") if url.strip()]
+router = ReplicaRouter(
+    engine,
+    [
+        instrument_engine(
+            create_async_engine(async_database_url(url), **engine_options(async_database_url(url))),
+            slow_query_seconds=float(os.getenv("NOTES_DB_SLOW_QUERY_SECONDS", "0.2")),
+        )
+        for url in REPLICA_URLS
+    ],
+    strategy=os.getenv("NOTES_DB_REPLICA_STRATEGY", "round_robin"),
+    sticky_seconds=float(os.getenv("NOTES_DB_READ_YOUR_WRITES_SECONDS", "5")),
+    health_interval=float(os.getenv("NOTES_DB_REPLICA_HEALTH_INTERVAL", "5")),
+    session_class=AsyncSession,
+)
+# Per-user cache of GET /notes and GET /notes/{id}; the user's writes invalidate it
+response_cache = ResponseCache(
+    ttl=float(os.getenv("NOTES_RESPONSE_CACHE_TTL", "30")),
+    stale_ttl=float(os.getenv("NOTES_RESPONSE_CACHE_STALE_TTL", "60")),
+    maxsize=int(os.getenv("NOTES_RESPONSE_CACHE_SIZE", "10000")),
+    enabled=os.getenv("NOTES_RESPONSE_CACHE", "true").lower() == "true",
+    prefix="notes:response",
+)
+STREAM_BATCH_SIZE = int(os.getenv("NOTES_STREAM_BATCH_SIZE", "500"))
+PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))
+
+# Models: own metadata, so app.models (also a "note" table) can be imported in the same process
+class NotesModel(SQLModel, registry=registry()):
+    pass
+
+class User(NotesModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     username: str = Field(index=True, unique=True)
     password: str
     role: str = Field(default="user")
 
-class Note(SQLModel, table=True):
+class Note(NotesModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     title: str
     content: str
@@ -42,11 +132,21 @@ class UserCreate(BaseModel):
     username: str
     password: str
 
+Role = Literal["user", "admin"]
+
 class UserResponse(BaseModel):
     id: int
     username: str
     role: str
 
+class Principal(BaseModel):
+    id: int
+    username: str
+    role: str
+
+class RoleUpdate(BaseModel):
+    role: Role
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -64,29 +164,58 @@ class NoteOut(BaseModel):
     title: str
     content: str
 
+notes_list_adapter = TypeAdapter(List[NoteOut])
+
 # DB table creation
-# def create_db_and_tables():
-#     SQLModel.metadata.create_all(engine)
+async def create_db_and_tables():
+    async with engine.begin() as connection:
+        await connection.run_sync(NotesModel.metadata.create_all)
+        await connection.run_sync(install_search)
 
 # DB session dependency
-def get_session():
-    with Session(engine) as session:
+async def get_session(request: Request):
+    # A write makes this client's reads go to the primary for a while (read-your-writes)
+    if request.method not in ("GET", "HEAD", "OPTIONS"):
+        router.mark_write(client_key(request))
+    async with router.session() as session:
+        yield session
+
+def read_session():
+    # Background revalidation has no request: any healthy replica will do
+    return router.session(read_only=True)
+
+async def get_read_session(request: Request):
+    async with router.session(read_only=True, key=client_key(request)) as session:
         yield session
 
 # Auth helpers
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+def hashing_busy_exception():
+    # A fresh exception per request: a shared instance would share its traceback between requests
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Authentication service is busy, try again later",
+        headers={"Retry-After": "1"},
+    )
+
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await hasher.verify(plain_password, hashed_password)
+    except (HashingPoolSaturated, BrokenProcessPool):
+        raise hashing_busy_exception()
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    try:
+        return await hasher.hash(password)
+    except (HashingPoolSaturated, BrokenProcessPool):
+        raise hashing_busy_exception()
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(get_session)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -101,13 +230,24 @@ def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Dep
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    user = session.exec(select(User).where(User.username == username)).first()
+
+    # Cheap path: the token already carries id and role, and they weren't revoked since it was issued
+    if TRUST_TOKEN_CLAIMS and "uid" in payload and "role" in payload:
+        if not await principal_cache.is_revoked(username, payload.get("iat")):
+            return Principal(id=payload["uid"], username=username, role=payload["role"])
+
+    cached = await principal_cache.get(username)
+    if cached is not None:
+        return Principal(**cached)
+    user = (await session.exec(select(User).where(User.username == username))).first()
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal(id=user.id, username=user.username, role=user.role)
+    await principal_cache.set(username, principal.model_dump())
+    return principal
 
 def require_role(required_role: str):
-    def role_checker(current_user: User = Depends(get_current_user)):
+    async def role_checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role != required_role:
             raise HTTPException(status_code=403, detail="Operation not permitted")
         return current_user
@@ -115,10 +255,25 @@ def require_role(required_role: str):
 
 # FastAPI app
 app = FastAPI()
+# Count statements per request and flag repeated ones (N+1)
+app.add_middleware(QueryTrackerMiddleware, repeat_threshold=int(os.getenv("NOTES_DB_REPEATED_QUERY_THRESHOLD", "10")))
 
 @app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+async def on_startup():
+    sql_log_pipeline.start()
+    await hasher.start()
+    await create_db_and_tables()
+    await router.start()
+    if REDIS_URL:
+        principal_cache.redis = instrument_redis(redis.Redis.from_url(REDIS_URL, decode_responses=True))
+        response_cache.redis = principal_cache.redis
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    hasher.shutdown()
+    await router.stop()
+    await engine.dispose()
+    sql_log_pipeline.stop()
 
 def custom_openapi():
     if app.openapi_schema:
@@ -145,74 +300,159 @@ def custom_openapi():
 app.openapi = custom_openapi
 
 @app.post("/register", response_model=UserResponse)
-def register(user: UserCreate, session: Session = Depends(get_session)):
-    existing_user = session.exec(select(User).where(User.username == user.username)).first()
+async def register(user: UserCreate, session: AsyncSession = Depends(get_session)):
+    existing_user = (await session.exec(select(User).where(User.username == user.username))).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     new_user = User(username=user.username, password=hashed_password, role="user")
     session.add(new_user)
-    session.commit()
-    session.refresh(new_user)
+    await session.commit()
+    await session.refresh(new_user)
     return new_user
 
 @app.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), session: Session = Depends(get_session)):
-    db_user = session.exec(select(User).where(User.username == form_data.username)).first()
-    if not db_user or not verify_password(form_data.password, db_user.password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), session: AsyncSession = Depends(get_session)):
+    db_user = (await session.exec(select(User).where(User.username == form_data.username))).first()
+    if not db_user or not await verify_password(form_data.password, db_user.password):
         raise HTTPException(status_code=401, detail="Invalid username or password")
-    access_token = create_access_token(data={"sub": db_user.username})
+    access_token = create_access_token(data={"sub": db_user.username, "uid": db_user.id, "role": db_user.role})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/users/me", response_model=UserResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: Principal = Depends(get_current_user)):
     return current_user
 
 @app.get("/admin/users", response_model=List[UserResponse])
-def list_users(session: Session = Depends(get_session), current_user: User = Depends(require_role("admin"))):
-    return session.exec(select(User)).all()
+async def list_users(session: AsyncSession = Depends(get_session), current_user: Principal = Depends(require_role("admin"))):
+    return (await session.exec(select(User))).all()
+
+@app.put("/admin/users/{user_id}/role", response_model=UserResponse)
+async def update_user_role(user_id: int, role_update: RoleUpdate, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(require_role("admin"))):
+    user = await session.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.role = role_update.role
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    # Drop the cached principal and stop trusting role claims in already issued tokens
+    await principal_cache.invalidate(user.username)
+    return user
+
+@app.get("/admin/profile")
+async def profile_endpoint(
+    seconds: float = Query(10, gt=0, le=PROFILER_MAX_SECONDS),
+    route: Optional[str] = None,
+    method: Optional[str] = None,
+    interval: float = Query(0.005, ge=0.001, le=0.1),
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+    all_threads: bool = False,
+    current_user: Principal = Depends(require_role("admin")),
+):
+    # Sampling profiler for the whole process or, with route/method, one endpoint
+    codes = None
+    if route:
+        codes = profiler.route_codes(app, route, method)
+        if not codes:
+            raise HTTPException(status_code=404, detail="Route not found")
+    try:
+        result = await profiler.profile(seconds, interval, codes, all_threads)
+    except profiler.ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+    content, media_type = profiler.render(result, format, f"{method or ''} {route or 'process'}".strip())
+    return Response(content=content, media_type=media_type)
 
 @app.post("/notes", response_model=NoteOut)
-def create_note(note: NoteCreate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
+async def create_note(note: NoteCreate, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_user)):
     new_note = Note(title=note.title, content=note.content, owner_id=current_user.id)
     session.add(new_note)
-    session.commit()
-    session.refresh(new_note)
+    await session.commit()
+    await session.refresh(new_note)
+    await response_cache.invalidate(user_tag(current_user))
     return new_note
 
+def user_tag(current_user: Principal, **_) -> str:
+    return f"user:{current_user.id}"
+
+def user_notes_statement(user_id: int, search: Optional[str] = None):
+    statement = select(Note).where(Note.owner_id == user_id)
+    if search and search.strip():
+        return apply_search(statement, Note, engine.dialect.name, search)
+    return statement.order_by(Note.id)
+
+# Cache misses read from a replica unless the client wrote recently; a page loaded across an
+# invalidation is not stored, since the cache write is checked against the version read before the load
 @app.get("/notes", response_model=List[NoteOut])
-def get_notes(session: Session = Depends(get_session), current_user: User = Depends(get_current_user), skip: int = 0, limit: int = 10, search: Optional[str] = None):
-    statement = select(Note).where(Note.owner_id == current_user.id)
-    if search:
-        statement = statement.where(Note.title.ilike(f"%{search}%") | Note.content.ilike(f"%{search}%"))
-    statement = statement.offset(skip).limit(limit)
-    return session.exec(statement).all()
+@response_cache.cached(user_tag, params=("skip", "limit", "search", "cursor"), session_param="session", session_factory=read_session)
+async def get_notes(session: AsyncSession = Depends(get_read_session), current_user: Principal = Depends(get_current_user), skip: int = 0, limit: int = 10, search: Optional[str] = None, cursor: Optional[str] = None):
+    # Keyset pagination: pass X-Next-Cursor back as ?cursor=; skip is kept for old clients
+    try:
+        after_id = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    ranked = bool(search and search.strip())
+    statement = user_notes_statement(current_user.id, search)
+    if ranked:
+        # Search results are ordered by relevance, not id, so they page with skip
+        statement = statement.offset(skip)
+    elif after_id is not None:
+        statement = statement.where(Note.id > after_id)
+    elif skip:
+        statement = statement.offset(skip)
+    notes = (await session.exec(statement.limit(limit + 1))).all()
+    headers = {}
+    if len(notes) > limit:
+        notes = notes[:limit]
+        if not ranked:
+            headers["X-Next-Cursor"] = encode_cursor(notes[-1].id)
+    # Serialize the page in one pydantic-core pass instead of response_model validation
+    with time_serialization("notes_list"):
+        content = notes_list_adapter.dump_json(notes_list_adapter.validate_python(notes, from_attributes=True))
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@app.get("/notes/stream", response_class=StreamingResponse)
+async def stream_notes(request: Request, current_user: Principal = Depends(get_current_user), search: Optional[str] = None):
+    key = client_key(request)
+    statement = user_notes_statement(current_user.id, search).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+    async def ndjson():
+        # Own session: it has to outlive the dependency while the body is being sent
+        async with router.session(read_only=True, key=key) as session:
+            result = await session.stream(statement)
+            async for note in result.scalars():
+                yield NoteOut.model_validate(note, from_attributes=True).model_dump_json().encode() + b"\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 @app.get("/notes/{note_id}", response_model=NoteOut)
-def get_note(note_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    note = session.get(Note, note_id)
+@response_cache.cached(user_tag, params=("note_id",), session_param="session", session_factory=read_session)
+async def get_note(note_id: int, session: AsyncSession = Depends(get_read_session), current_user: Principal = Depends(get_current_user)):
+    note = await session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
-    return note
+    return Response(content=NoteOut.model_validate(note, from_attributes=True).model_dump_json(), media_type="application/json")
 
 @app.put("/notes/{note_id}", response_model=NoteOut)
-def update_note(note_id: int, note_update: NoteUpdate, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    note = session.get(Note, note_id)
+async def update_note(note_id: int, note_update: NoteUpdate, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_user)):
+    note = await session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
     note_data = note_update.dict(exclude_unset=True)
     for key, value in note_data.items():
         setattr(note, key, value)
     session.add(note)
-    session.commit()
-    session.refresh(note)
+    await session.commit()
+    await session.refresh(note)
+    await response_cache.invalidate(user_tag(current_user))
     return note
 
 @app.delete("/notes/{note_id}")
-def delete_note(note_id: int, session: Session = Depends(get_session), current_user: User = Depends(get_current_user)):
-    note = session.get(Note, note_id)
+async def delete_note(note_id: int, session: AsyncSession = Depends(get_session), current_user: Principal = Depends(get_current_user)):
+    note = await session.get(Note, note_id)
     if not note or note.owner_id != current_user.id:
         raise HTTPException(status_code=404, detail="Note not found")
-    session.delete(note)
-    session.commit()
+    await session.delete(note)
+    await session.commit()
+    await response_cache.invalidate(user_tag(current_user))
     return {"detail": "Note deleted"}
@@ -0,0 +1,166 @@
+"""Sampling profiler for on-demand production profiling.
+
+A background thread reads the stacks of the running threads every ``interval``
+seconds via ``sys._current_frames()``; nothing is hooked into the profiled code,
+so the cost is one stack walk per sample regardless of traffic. Samples show
+on-CPU time: while the event loop waits on I/O it is sampled in ``select``.
+
+With ``codes`` set (see ``route_codes``) only stacks passing through one of
+those endpoint functions are kept, which profiles a single route. SQLAlchemy's
+async ORM work runs inside greenlets whose stacks do not link back to the
+endpoint; profile the whole process to see it.
+"""
+import asyncio
+import inspect
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+FrameKey = Tuple[str, str, int]
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class ProfilerBusy(Exception):
+    """Another profiling session is already running."""
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005, thread_id: Optional[int] = None, codes: Optional[Set] = None):
+        self.interval = interval
+        self.thread_id = thread_id
+        self.codes = codes
+        self.frames: List[FrameKey] = []
+        self._frame_index: Dict[FrameKey, int] = {}
+        # Stack (root first, as frame indexes) -> seconds attributed to it
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._switch_interval: Optional[float] = None
+
+    def _index(self, code) -> int:
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        index = self._frame_index.get(key)
+        if index is None:
+            index = self._frame_index[key] = len(self.frames)
+            self.frames.append(key)
+        return index
+
+    def _record(self, frame, weight: float):
+        codes = []
+        matched = self.codes is None
+        while frame is not None:
+            codes.append(frame.f_code)
+            matched = matched or frame.f_code in self.codes
+            frame = frame.f_back
+        if matched:
+            self.stacks[tuple(self._index(code) for code in reversed(codes))] += weight
+            self.samples += 1
+
+    def _run(self):
+        own_id = threading.get_ident()
+        started_at = last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            # Weight by the real gap: a late wakeup still accounts for the elapsed time
+            weight, last = now - last, now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id and (self.thread_id is None or thread_id == self.thread_id):
+                    self._record(frame, weight)
+        self.duration = time.perf_counter() - started_at
+
+    def start(self):
+        # The sampler only runs when it gets the GIL. With the default 5ms switch interval a
+        # busy event loop hands it over almost only in select(), hiding the CPU-bound code,
+        # so the interval is lowered for the duration of the session.
+        self._switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch_interval, self.interval / 5))
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._switch_interval is not None:
+            sys.setswitchinterval(self._switch_interval)
+            self._switch_interval = None
+
+    def speedscope(self, name: str = "profile") -> dict:
+        stacks = list(self.stacks.items())
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "app.profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": [{"name": fn, "file": file, "line": line} for fn, file, line in self.frames]},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": [list(stack) for stack, _ in stacks],
+                "weights": [weight for _, weight in stacks],
+            }],
+        }
+
+    def collapsed(self) -> str:
+        # Brendan Gregg's folded format (flamegraph.pl, speedscope, inferno), weights in microseconds
+        lines = []
+        for stack, weight in self.stacks.items():
+            names = ";".join(f"{self.frames[i][0]} ({self.frames[i][1]}:{self.frames[i][2]})" for i in stack)
+            lines.append(f"{names} {max(1, round(weight * 1_000_000))}")
+        return "\n".join(lines) + "\n"
+
+
+def render(profiler: SamplingProfiler, fmt: str, name: str) -> Tuple[str, str]:
+    """(body, media type) for ``fmt`` = speedscope | collapsed."""
+    if fmt == "collapsed":
+        return profiler.collapsed(), "text/plain"
+    return json.dumps(profiler.speedscope(name)), "application/json"
+
+
+def route_codes(app, path: str, method: Optional[str] = None) -> Set:
+    """Code objects of the endpoints serving ``path`` (optionally one HTTP method).
+
+    Decorated endpoints are unwrapped: every route behind the same decorator (e.g.
+    ``ResponseCache.cached``) shares the wrapper's code object.
+    """
+    codes = set()
+    for route in app.routes:
+        if getattr(route, "path", None) != path:
+            continue
+        if method and method.upper() not in (getattr(route, "methods", None) or ()):
+            continue
+        code = getattr(inspect.unwrap(route.endpoint), "__code__", None)
+        if code is not None:
+            codes.add(code)
+    return codes
+
+
+_session_lock = asyncio.Lock()
+
+
+async def profile(seconds: float, interval: float = 0.005, codes: Optional[Set] = None, all_threads: bool = False) -> SamplingProfiler:
+    """Samples the event loop thread for ``seconds``; one session at a time.
+
+    Route profiles (``codes``) look at every thread, since sync endpoints run in the threadpool.
+    """
+    if _session_lock.locked():
+        raise ProfilerBusy()
+    async with _session_lock:
+        thread_id = None if all_threads or codes else threading.get_ident()
+        profiler = SamplingProfiler(interval, thread_id=thread_id, codes=codes)
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            # join() is quick: the sampler wakes up at least every interval
+            profiler.stop()
+        return profiler
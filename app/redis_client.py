@@ -0,0 +1,124 @@
+import asyncio
+import time
+from typing import Any, List, Set, Tuple
+
+import redis.asyncio as redis
+from prometheus_client import Counter, Gauge, Histogram
+from redis.exceptions import NoScriptError
+
+REDIS_POOL_WAIT = Histogram(
+    "app_redis_pool_wait_seconds",
+    "Ожидание свободного соединения в пуле Redis",
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+REDIS_POOL_IN_USE = Gauge("app_redis_pool_connections_in_use", "Занятые соединения пула Redis")
+REDIS_POOL_MAX = Gauge("app_redis_pool_max_connections", "Размер пула соединений Redis")
+REDIS_POOL_EXHAUSTED = Counter(
+    "app_redis_pool_exhausted_total",
+    "Запросы соединения, не дождавшиеся свободного места в пуле",
+)
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """Ограниченный пул: при нехватке соединений ждёт до timeout, а не открывает новые."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        REDIS_POOL_MAX.set(self.max_connections)
+
+    async def get_connection(self, *args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            # Старые redis-py передают command_name позиционно и требуют его
+            connection = await super().get_connection(*args, **kwargs)
+        except redis.ConnectionError as exc:
+            # Пул не дал соединение за timeout (ConnectionError из TimeoutError): нужен больший REDIS_MAX_CONNECTIONS
+            if isinstance(exc.__cause__, asyncio.TimeoutError):
+                REDIS_POOL_EXHAUSTED.inc()
+            raise
+        finally:
+            REDIS_POOL_WAIT.observe(time.perf_counter() - started_at)
+            REDIS_POOL_IN_USE.set(len(self._in_use_connections))
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        REDIS_POOL_IN_USE.set(len(self._in_use_connections))
+
+
+def create_redis_client(url: str, max_connections: int = 50, pool_timeout: float = 5.0) -> redis.Redis:
+    """Один клиент на процесс; создаётся при старте приложения и закрывается при остановке."""
+    pool = InstrumentedConnectionPool.from_url(
+        url,
+        max_connections=max_connections,
+        timeout=pool_timeout,
+        decode_responses=True,
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def _retrieve(future: asyncio.Future):
+    # Результат предзагрузки может так и не понадобиться (например, ответ 429)
+    if not future.cancelled():
+        future.exception()
+
+
+class RedisBatcher:
+    """Команды, поставленные в одном тике event loop, уходят одним pipeline — за один round trip.
+
+    Живёт в рамках одного HTTP-запроса: rate limiter и предзагрузка кэша ставят свои
+    команды до первого await и получают результаты из общего ответа.
+    """
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._pending: List[Tuple[tuple, asyncio.Future, Any]] = []
+        # Ссылки на отправки в полёте: event loop держит задачи только слабыми ссылками
+        self._tasks: Set[asyncio.Task] = set()
+        self.round_trips = 0
+
+    def _queue(self, args: tuple, script=None) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        future.add_done_callback(_retrieve)
+        if not self._pending:
+            loop.call_soon(self._flush_soon)
+        self._pending.append((args, future, script))
+        return future
+
+    def execute_command(self, *args) -> asyncio.Future:
+        return self._queue(args)
+
+    def script(self, script, keys: List[str], args: List[Any]) -> asyncio.Future:
+        """EVALSHA для скрипта из register_script; если Redis его не знает — загрузка и повтор."""
+        return self._queue(("EVALSHA", script.sha, len(keys), *keys, *args), script)
+
+    def _flush_soon(self):
+        pending, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._flush(pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, pending: List[Tuple[tuple, asyncio.Future, Any]]):
+        self.round_trips += 1
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for args, _, _ in pending:
+                    pipe.execute_command(*args)
+                results = await pipe.execute(raise_on_error=False)
+        except Exception as exc:
+            results = [exc] * len(pending)
+        for (args, future, script), result in zip(pending, results):
+            if isinstance(result, NoScriptError) and script is not None:
+                # Скрипта нет в кэше Redis (первый вызов или SCRIPT FLUSH)
+                try:
+                    result = await script(keys=list(args[3:3 + args[2]]), args=list(args[3 + args[2]:]), client=self.client)
+                except Exception as exc:
+                    result = exc
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
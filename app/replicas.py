@@ -0,0 +1,187 @@
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Sequence
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.cache import LocalTTLCache
+
+logger = logging.getLogger("uvicorn.error")
+
+DB_ROUTED_SESSIONS = Counter(
+    "app_db_routed_sessions_total",
+    "Сессии по месту выполнения: primary, replica, sticky (после своей записи), fallback (реплики недоступны)",
+    ["target"],
+)
+DB_REPLICA_HEALTHY = Gauge("app_db_replica_healthy", "1, если реплика отвечает на проверку", ["replica"])
+
+# Ошибки подключения и проверки, после которых реплика считается недоступной до следующей успешной проверки
+CONNECTION_ERRORS = (OperationalError, InterfaceError, OSError, asyncio.TimeoutError)
+
+
+def is_connection_lost(exc: BaseException) -> bool:
+    # Во время запроса недоступность — только разрыв соединения; таймаут запроса или
+    # ошибка в SQL (тоже OperationalError) здоровую реплику не выключают
+    if isinstance(exc, DBAPIError):
+        return exc.connection_invalidated or isinstance(exc, InterfaceError)
+    return isinstance(exc, OSError)
+
+STRATEGIES = ("round_robin", "least_connections")
+
+
+class Replica:
+    def __init__(self, engine: AsyncEngine, factory: sessionmaker):
+        self.engine = engine
+        self.factory = factory
+        self.name = engine.url.render_as_string(hide_password=True)
+        self.healthy = True
+        self.in_use = 0
+
+    def set_healthy(self, healthy: bool):
+        if healthy != self.healthy:
+            logger.warning("Database replica %s is %s", self.name, "back up" if healthy else "unavailable")
+        self.healthy = healthy
+        DB_REPLICA_HEALTHY.labels(self.name).set(int(healthy))
+
+
+class ReplicaRouter:
+    """Фабрика сессий: записи — на primary, чтения — на реплики.
+
+    Реплика выбирается по кругу или по наименьшему числу открытых сессий. После записи
+    клиент (key) sticky_seconds читает с primary, чтобы видеть свои изменения несмотря
+    на отставание реплик; это состояние живёт в памяти процесса. Недоступные реплики
+    пропускаются до следующей успешной проверки; без реплик все чтения идут на primary.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine] = (),
+        strategy: str = "round_robin",
+        sticky_seconds: float = 5.0,
+        health_interval: float = 5.0,
+        health_timeout: float = 2.0,
+        sticky_maxsize: int = 10000,
+        session_class=AsyncSession,
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown replica strategy: {strategy}")
+        self.primary = primary
+        self.primary_factory = sessionmaker(primary, class_=session_class, expire_on_commit=False)
+        self.replicas: List[Replica] = [
+            Replica(engine, sessionmaker(engine, class_=session_class, expire_on_commit=False)) for engine in replicas
+        ]
+        for replica in self.replicas:
+            DB_REPLICA_HEALTHY.labels(replica.name).set(1)
+        self.strategy = strategy
+        self.sticky_seconds = sticky_seconds
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self._sticky = LocalTTLCache(maxsize=sticky_maxsize, ttl=sticky_seconds)
+        self._round_robin = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_write(self, key: Optional[str]):
+        if key is not None and self.sticky_seconds > 0:
+            self._sticky.set(key, True)
+
+    def choose(self, key: Optional[str] = None) -> tuple:
+        """(реплика или None для primary, метка для метрики)."""
+        if not self.replicas:
+            return None, "primary"
+        if key is not None and self._sticky.get(key):
+            return None, "sticky"
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None, "fallback"
+        if self.strategy == "least_connections":
+            return min(healthy, key=lambda replica: replica.in_use), "replica"
+        return healthy[next(self._round_robin) % len(healthy)], "replica"
+
+    @asynccontextmanager
+    async def session(self, read_only: bool = False, key: Optional[str] = None):
+        replica, target = self.choose(key) if read_only else (None, "primary")
+        DB_ROUTED_SESSIONS.labels(target).inc()
+        if replica is None:
+            async with self.primary_factory() as session:
+                yield session
+            return
+
+        replica.in_use += 1
+        unavailable = False
+        try:
+            async with replica.factory() as session:
+                try:
+                    # Соединение берём сразу: ошибка здесь — недоступность реплики, а не запроса
+                    await session.connection()
+                except CONNECTION_ERRORS:
+                    replica.set_healthy(False)
+                    unavailable = True
+                if not unavailable:
+                    try:
+                        yield session
+                    except Exception as exc:
+                        if is_connection_lost(exc):
+                            replica.set_healthy(False)
+                        raise
+        finally:
+            replica.in_use -= 1
+        if unavailable:
+            # Запрос ещё ничего не прочитал: обслуживаем его с primary, а не отдаём ошибку
+            DB_ROUTED_SESSIONS.labels("fallback").inc()
+            async with self.primary_factory() as session:
+                yield session
+
+    @staticmethod
+    async def _select_one(replica: Replica):
+        async with replica.engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    async def _ping(self, replica: Replica) -> bool:
+        # Таймаут на подключение вместе с запросом: недоступный хост не задерживает старт приложения
+        try:
+            await asyncio.wait_for(self._select_one(replica), self.health_timeout)
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    async def check_health(self) -> Dict[str, bool]:
+        results = await asyncio.gather(*(self._ping(replica) for replica in self.replicas))
+        for replica, healthy in zip(self.replicas, results):
+            replica.set_healthy(healthy)
+        return {replica.name: replica.healthy for replica in self.replicas}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception:
+                logger.error("Replica health check failed", exc_info=True)
+
+    async def start(self):
+        if self.replicas and self._task is None:
+            await self.check_health()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+def client_key(request) -> str:
+    # Токен, если он есть, иначе IP: "свои" записи — записи того же клиента
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return authorization
+    return request.client.host if request.client else "unknown"
@@ -0,0 +1,195 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from fastapi import Response
+from prometheus_client import Counter
+
+from app.cache import READ_SCRIPT, LocalTTLCache
+
+logger = logging.getLogger("uvicorn.error")
+
+RESPONSE_CACHE_EVENTS = Counter(
+    "app_response_cache_events_total",
+    "Route-level response cache lookups: hit, stale, miss, invalidate",
+    ["route", "event"],
+)
+
+# Only these response headers are stored and replayed
+CACHED_HEADERS = ("content-type", "x-next-cursor")
+
+# Store the entry only if the tag is still at the version the load started from
+WRITE_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+class CachedResponse(NamedTuple):
+    created_at: float
+    body: bytes
+    headers: Dict[str, str]
+
+    def dumps(self) -> str:
+        return json.dumps({"t": self.created_at, "b": self.body.decode(), "h": self.headers})
+
+    @classmethod
+    def loads(cls, raw: str) -> "CachedResponse":
+        data = json.loads(raw)
+        return cls(data["t"], data["b"].encode(), data["h"])
+
+
+def normalize(value: Any) -> Any:
+    # "  rust   async " and "rust async" are the same search
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+class ResponseCache:
+    """Route-level cache of 200 responses, keyed by a tag (e.g. the user) and query params.
+
+    Invalidation bumps the tag's version, so every cached page of that user is
+    dropped at once. Entries older than ``ttl`` are served for up to ``stale_ttl``
+    more while a single background task reloads them (stale-while-revalidate);
+    invalidated entries are never served stale. Without Redis the cache is local
+    to the process.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 30,
+        stale_ttl: float = 60,
+        maxsize: int = 10000,
+        redis_client=None,
+        prefix: str = "response",
+        enabled: bool = True,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.local = LocalTTLCache(maxsize=maxsize, ttl=ttl + stale_ttl)
+        self.versions: Dict[str, int] = {}
+        self.prefix = prefix
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._read_script = None
+        self._write_script = None
+        self.redis = redis_client
+
+    @property
+    def redis(self):
+        return self._redis
+
+    @redis.setter
+    def redis(self, client):
+        self._redis = client
+        self._read_script = client.register_script(READ_SCRIPT) if client is not None else None
+        self._write_script = client.register_script(WRITE_SCRIPT) if client is not None else None
+
+    def _version_key(self, tag: str) -> str:
+        return f"{self.prefix}:{tag}:version"
+
+    async def read(self, tag: str, key: str) -> Tuple[str, Optional[CachedResponse]]:
+        """(current tag version, entry stored under it or None)."""
+        if self.redis is None:
+            version = str(self.versions.get(tag, 0))
+            return version, self.local.get(f"{tag}:v{version}:{key}")
+        result = await self._read_script(keys=[self._version_key(tag)], args=[f"{self.prefix}:{tag}", key])
+        version, raw = result[0], result[1] if len(result) > 1 else None
+        return version, CachedResponse.loads(raw) if raw else None
+
+    async def write(self, tag: str, version: str, key: str, entry: CachedResponse) -> bool:
+        """Stores the entry unless the tag was invalidated since ``version`` was read."""
+        if self.redis is None:
+            if str(self.versions.get(tag, 0)) != version:
+                return False
+            self.local.set(f"{tag}:v{version}:{key}", entry)
+            return True
+        stored = await self._write_script(
+            keys=[self._version_key(tag), f"{self.prefix}:{tag}:v{version}:{key}"],
+            args=[version, entry.dumps(), max(1, int(self.ttl + self.stale_ttl))],
+        )
+        return bool(stored)
+
+    async def invalidate(self, tag: str):
+        if self.redis is None:
+            self.versions[tag] = self.versions.get(tag, 0) + 1
+        else:
+            await self.redis.incr(self._version_key(tag))
+        RESPONSE_CACHE_EVENTS.labels("*", "invalidate").inc()
+
+    def cached(
+        self,
+        tag: Callable[..., str],
+        params: Sequence[str] = (),
+        session_param: Optional[str] = None,
+        session_factory: Optional[Callable] = None,
+    ):
+        """Caches a FastAPI endpoint that returns a ``Response``.
+
+        ``tag`` gets the endpoint kwargs and names the invalidation group; ``params``
+        are the kwargs that make up the key. Background revalidation runs the endpoint
+        with a fresh session from ``session_factory`` in place of ``session_param``,
+        since the request's own session is closed by then. A disabled cache leaves
+        the endpoint as is.
+        """
+
+        def decorator(endpoint):
+            if not self.enabled:
+                return endpoint
+            route = endpoint.__name__
+
+            async def load(tag_value: str, version: str, key: str, kwargs: dict) -> Response:
+                response = await endpoint(**kwargs)
+                if isinstance(response, Response) and response.status_code == 200:
+                    headers = {name: value for name, value in response.headers.items() if name in CACHED_HEADERS}
+                    await self.write(tag_value, version, key, CachedResponse(time.time(), response.body, headers))
+                return response
+
+            async def refresh(tag_value: str, version: str, key: str, kwargs: dict):
+                try:
+                    if session_param is None:
+                        await load(tag_value, version, key, kwargs)
+                        return
+                    async with session_factory() as session:
+                        await load(tag_value, version, key, {**kwargs, session_param: session})
+                except Exception:
+                    logger.error("Background revalidation of %s failed", route, exc_info=True)
+                finally:
+                    self._refreshing.pop(f"{tag_value}:{key}", None)
+
+            @functools.wraps(endpoint)
+            async def wrapper(**kwargs):
+                tag_value = tag(**kwargs)
+                parts = json.dumps([route, [[name, normalize(kwargs.get(name))] for name in params]], default=str)
+                key = hashlib.blake2b(parts.encode(), digest_size=16).hexdigest()
+                version, entry = await self.read(tag_value, key)
+
+                if entry is not None:
+                    age = time.time() - entry.created_at
+                    if age < self.ttl:
+                        RESPONSE_CACHE_EVENTS.labels(route, "hit").inc()
+                        return Response(content=entry.body, headers={**entry.headers, "X-Cache": "HIT"})
+                    if age < self.ttl + self.stale_ttl:
+                        RESPONSE_CACHE_EVENTS.labels(route, "stale").inc()
+                        refresh_key = f"{tag_value}:{key}"
+                        if refresh_key not in self._refreshing:
+                            self._refreshing[refresh_key] = asyncio.create_task(refresh(tag_value, version, key, kwargs))
+                        return Response(content=entry.body, headers={**entry.headers, "X-Cache": "STALE"})
+
+                RESPONSE_CACHE_EVENTS.labels(route, "miss").inc()
+                response = await load(tag_value, version, key, kwargs)
+                if isinstance(response, Response):
+                    response.headers["X-Cache"] = "MISS"
+                return response
+
+            return wrapper
+
+        return decorator
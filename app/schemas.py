@@ -1,5 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import datetime
+from typing import List, Optional
 
 class NoteCreate(BaseModel):
     text: str = Field(
@@ -16,3 +17,28 @@ class NoteOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+class BulkNotesOut(BaseModel):
+    ids: List[int] = Field(..., description="Идентификаторы созданных заметок в порядке передачи")
+    count: int = Field(..., description="Количество созданных заметок", example=2)
+
+class BulkEmailIn(BaseModel):
+    emails: List[str] = Field(..., min_length=1, description="Адреса получателей (дубликаты отправляются один раз)")
+    subject: Optional[str] = Field(None, description="Тема письма")
+    body: Optional[str] = Field(None, description="Текст письма")
+
+class BulkEmailOut(BaseModel):
+    group_id: str = Field(..., description="Идентификатор рассылки для запроса прогресса")
+    batches: int = Field(..., description="Количество пачек (задач Celery)")
+    recipients: int = Field(..., description="Количество уникальных получателей")
+
+class BulkEmailProgress(BaseModel):
+    batches: int = Field(..., description="Всего пачек")
+    completed: int = Field(..., description="Успешно завершённых пачек")
+    failed_batches: int = Field(..., description="Пачек, завершившихся ошибкой")
+    sent: int = Field(..., description="Отправлено писем в завершённых пачках")
+    failed: int = Field(..., description="Отклонённых адресов в завершённых пачках")
+
+# Сериализация списка одним проходом (pydantic-core), без response_model на горячем пути
+notes_list_adapter = TypeAdapter(List[NoteOut])
+notes_create_adapter = TypeAdapter(List[NoteCreate])
@@ -0,0 +1,92 @@
+"""Full-text search over notes (title + content) for notes_api_final.
+
+PostgreSQL: generated ``tsvector`` column with a GIN index, ranked by ``ts_rank``.
+SQLite: FTS5 external-content table kept in sync by triggers, ranked by ``bm25``.
+Other dialects fall back to ILIKE.
+"""
+from sqlalchemy import and_, column, func, literal_column, table, text
+from sqlalchemy.engine import Connection
+
+SEARCH_CONFIG = "simple"
+
+note_fts = table("note_fts", column("rowid"))
+
+POSTGRES_INSTALL = [
+    f"""ALTER TABLE note ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('{SEARCH_CONFIG}', coalesce(title, '') || ' ' || coalesce(content, ''))) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_note_search_vector ON note USING GIN (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS ix_note_search_vector",
+    "ALTER TABLE note DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS note_fts USING fts5(title, content, content='note', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS note_fts_ai AFTER INSERT ON note BEGIN
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS note_fts_ad AFTER DELETE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS note_fts_au AFTER UPDATE ON note BEGIN
+        INSERT INTO note_fts(note_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO note_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+    END""",
+    # Index rows that existed before the triggers
+    "INSERT INTO note_fts(note_fts) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    "DROP TRIGGER IF EXISTS note_fts_au",
+    "DROP TRIGGER IF EXISTS note_fts_ad",
+    "DROP TRIGGER IF EXISTS note_fts_ai",
+    "DROP TABLE IF EXISTS note_fts",
+]
+
+
+def _statements(dialect_name: str, install: bool):
+    if dialect_name == "postgresql":
+        return POSTGRES_INSTALL if install else POSTGRES_UNINSTALL
+    if dialect_name == "sqlite":
+        return SQLITE_INSTALL if install else SQLITE_UNINSTALL
+    return []
+
+
+def install_search(connection: Connection):
+    if connection.dialect.name == "sqlite" and connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'note_fts'")
+    ).first():
+        # Already installed; skip the O(n) rebuild on every startup
+        return
+    for statement in _statements(connection.dialect.name, install=True):
+        connection.execute(text(statement))
+
+
+def uninstall_search(connection: Connection):
+    for statement in _statements(connection.dialect.name, install=False):
+        connection.execute(text(statement))
+
+
+def fts5_query(search: str) -> str:
+    # Every word becomes a quoted term (implicit AND), so user input can't break FTS5 syntax
+    return " ".join('"%s"' % word.replace('"', '""') for word in search.split())
+
+
+def apply_search(statement, note_model, dialect_name: str, search: str):
+    """Filter ``statement`` to notes matching ``search``, most relevant first."""
+    if dialect_name == "postgresql":
+        query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'::regconfig"), search)
+        vector = literal_column("note.search_vector")
+        return statement.where(vector.op("@@")(query)).order_by(func.ts_rank(vector, query).desc(), note_model.id)
+    if dialect_name == "sqlite":
+        fts = literal_column("note_fts")
+        return (
+            statement.join(note_fts, note_fts.c.rowid == note_model.id)
+            .where(fts.op("MATCH")(fts5_query(search)))
+            .order_by(func.bm25(fts), note_model.id)
+        )
+    # Like the full-text paths, every word must match (in the title or the content)
+    terms = [note_model.title.ilike(f"%{word}%") | note_model.content.ilike(f"%{word}%") for word in search.split()]
+    return statement.where(and_(*terms)).order_by(note_model.id)
@@ -0,0 +1,144 @@
+import asyncio
+import inspect
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger("uvicorn.error")
+
+TASK_QUEUE_WAIT = Histogram(
+    "app_task_queue_wait_seconds",
+    "Ожидание фоновой задачи в очереди до начала выполнения",
+    ["task"],
+)
+TASK_RUN_TIME = Histogram(
+    "app_task_run_seconds",
+    "Время выполнения одной попытки фоновой задачи",
+    ["task", "status"],
+)
+TASK_EVENTS = Counter(
+    "app_task_events_total",
+    "Исходы фоновых задач: succeeded, retried, failed, rejected",
+    ["task", "event"],
+)
+
+
+class TaskQueueFull(Exception):
+    """Очередь фоновых задач заполнена (или backend останавливается)."""
+
+
+def task_name(task: Callable) -> str:
+    return getattr(task, "name", None) or task.__name__
+
+
+class CeleryTaskBackend:
+    """Задача уходит в брокер; подходит для тяжёлой работы в отдельном воркере."""
+
+    name = "celery"
+
+    async def submit(self, task, *args, **kwargs) -> str:
+        return task.delay(*args, **kwargs).id
+
+    async def start(self):
+        pass
+
+    async def stop(self, timeout: Optional[float] = None):
+        pass
+
+
+@dataclass
+class Job:
+    task: Callable
+    args: Tuple
+    kwargs: Dict[str, Any]
+    enqueued_at: float
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+
+class AsyncioTaskBackend:
+    """Пул воркеров внутри процесса приложения: без брокера, сериализации и сетевого хопа.
+
+    Корутины выполняются в event loop, синхронные функции (в том числе задачи Celery,
+    вызванные напрямую) — в threadpool. Не больше concurrency задач одновременно.
+    """
+
+    name = "asyncio"
+
+    def __init__(self, concurrency: int = 4, max_queue: int = 1000, max_retries: int = 3, retry_delay: float = 0.5):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._workers: List[asyncio.Task] = []
+        self._closing = False
+
+    async def submit(self, task, *args, **kwargs) -> str:
+        if self._closing:
+            raise TaskQueueFull("Task backend is shutting down")
+        job = Job(task, args, kwargs, time.perf_counter())
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            TASK_EVENTS.labels(task_name(task), "rejected").inc()
+            raise TaskQueueFull("Task queue is full")
+        return job.id
+
+    async def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def _work(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job: Job):
+        name = task_name(job.task)
+        TASK_QUEUE_WAIT.labels(name).observe(time.perf_counter() - job.enqueued_at)
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                if inspect.iscoroutinefunction(job.task):
+                    await job.task(*job.args, **job.kwargs)
+                else:
+                    await run_in_threadpool(job.task, *job.args, **job.kwargs)
+            except Exception:
+                TASK_RUN_TIME.labels(name, "error").observe(time.perf_counter() - start)
+                if attempt == self.max_retries:
+                    TASK_EVENTS.labels(name, "failed").inc()
+                    logger.exception("Background task %s (%s) failed", name, job.id)
+                    return
+                TASK_EVENTS.labels(name, "retried").inc()
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+            else:
+                TASK_RUN_TIME.labels(name, "success").observe(time.perf_counter() - start)
+                TASK_EVENTS.labels(name, "succeeded").inc()
+                return
+
+    async def stop(self, timeout: Optional[float] = 30.0):
+        # Новые задачи не принимаем, уже поставленные дорабатываем
+        self._closing = True
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Task backend drain timed out, %d jobs dropped", self.queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+def create_task_backend(name: str, **options):
+    if name == CeleryTaskBackend.name:
+        return CeleryTaskBackend()
+    if name == AsyncioTaskBackend.name:
+        return AsyncioTaskBackend(**options)
+    raise ValueError(f"Unknown task backend: {name}")
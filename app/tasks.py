@@ -1,5 +1,11 @@
-from celery import Celery
-import time
+from typing import Dict, List, Optional
+
+from celery import Celery, group
+from celery.result import GroupResult
+from celery.signals import worker_process_shutdown
+
+from app import mail
+from app.config import settings
 
 celery_app = Celery(
     "app.tasks",
@@ -7,9 +13,96 @@ celery_app = Celery(
     backend="redis://redis:6379/0"
 )
 
+# Пул создаётся лениво уже в дочернем процессе воркера (после fork)
+_smtp_pool: Optional[mail.SMTPPool] = None
+
+
+def smtp_pool() -> mail.SMTPPool:
+    global _smtp_pool
+    if _smtp_pool is None:
+        _smtp_pool = mail.SMTPPool(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_USE_TLS,
+            size=settings.SMTP_POOL_SIZE,
+        )
+    return _smtp_pool
+
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs):
+    if _smtp_pool is not None:
+        _smtp_pool.close()
+
+
 @celery_app.task
 def send_email(email: str):
     print(f"📨 Отправка письма на {email}...")
-    time.sleep(5)
+    sent, failed = mail.send_batch(smtp_pool(), settings.EMAIL_FROM, [email])
+    if failed:
+        return {"status": "ошибка", "email": email, "error": failed[email]}
     print(f"✅ Письмо успешно отправлено на {email}")
     return {"status": "отправлено", "email": email}
+
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=5)
+def send_email_batch(
+    self,
+    recipients: List[str],
+    subject: str = mail.DEFAULT_SUBJECT,
+    body: str = mail.DEFAULT_BODY,
+    sent_before: int = 0,
+    failed_before: Optional[Dict[str, str]] = None,
+):
+    """Одна пачка получателей — одно SMTP-соединение; итог пачки попадает в результат задачи."""
+    sent, failed = [], {}
+    # Отказы прошлых попыток переносим в повтор, иначе они пропадут из отчёта
+    failed_before = failed_before or {}
+    try:
+        mail.send_batch(smtp_pool(), settings.EMAIL_FROM, recipients, subject, body, sent, failed)
+    except mail.CONNECTION_ERRORS as e:
+        # Повторяем только тех, до кого не дошли
+        remaining = recipients[len(sent) + len(failed):]
+        raise self.retry(
+            exc=e,
+            args=[remaining],
+            kwargs={
+                "subject": subject,
+                "body": body,
+                "sent_before": sent_before + len(sent),
+                "failed_before": {**failed_before, **failed},
+            },
+        )
+    return {"sent": sent_before + len(sent), "failed": {**failed_before, **failed}}
+
+
+def enqueue_emails(
+    emails: List[str],
+    subject: str = mail.DEFAULT_SUBJECT,
+    body: str = mail.DEFAULT_BODY,
+    batch_size: Optional[int] = None,
+) -> GroupResult:
+    # Дубликаты убираем с сохранением порядка; одно сообщение брокеру на пачку
+    recipients = list(dict.fromkeys(emails))
+    batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+    batches = [recipients[start:start + batch_size] for start in range(0, len(recipients), batch_size)]
+    result = group(send_email_batch.s(batch, subject=subject, body=body) for batch in batches).apply_async()
+    # Сохраняем группу, чтобы прогресс можно было получить по её id
+    result.save()
+    return result
+
+
+def batch_progress(group_id: str) -> Optional[dict]:
+    result = GroupResult.restore(group_id, app=celery_app)
+    if result is None:
+        return None
+    done = [child.result for child in result.results if child.successful()]
+    return {
+        "batches": len(result.results),
+        "completed": result.completed_count(),
+        "failed_batches": sum(1 for child in result.results if child.failed()),
+        "sent": sum(report["sent"] for report in done),
+        "failed": sum(len(report["failed"]) for report in done),
+    }
@@ -0,0 +1,126 @@
+# app/tests/test_admission.py
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.middleware.admission import HIGH, NORMAL, AdmissionControlMiddleware, AdmissionController, Overloaded
+
+
+def test_excess_requests_queue_then_get_rejected():
+    async def scenario():
+        controller = AdmissionController(initial_limit=2, max_queue=1, interval=1.0)
+        await controller.acquire()
+        await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "queue_full"
+
+        controller.release(0.01)
+        assert await waiting >= 0
+        assert controller.in_flight == 2
+
+    asyncio.run(scenario())
+
+
+def test_high_priority_goes_first_and_evicts_normal():
+    async def scenario():
+        controller = AdmissionController(initial_limit=1, max_limit=1, max_queue=2, interval=1.0)
+        await controller.acquire()
+        first = asyncio.ensure_future(controller.acquire(NORMAL))
+        second = asyncio.ensure_future(controller.acquire(NORMAL))
+        await asyncio.sleep(0)
+        write = asyncio.ensure_future(controller.acquire(HIGH))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as evicted:
+            await second
+        assert evicted.value.reason == "evicted"
+
+        controller.release(0.01)
+        await write
+        assert not first.done()
+        controller.release(0.01)
+        await first
+
+    asyncio.run(scenario())
+
+
+def test_standing_queue_sheds_fast_and_shrinks_limit():
+    async def scenario():
+        controller = AdmissionController(initial_limit=10, max_queue=10, target_delay=0.001, interval=0.1)
+        for _ in range(10):
+            await controller.acquire()
+        first = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0.05)
+        second = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0.07)
+        # Первый ждал весь interval и получил отказ, лимит уменьшен
+        with pytest.raises(Overloaded):
+            await first
+        assert controller.limit == 9
+        # Очередь не пустеет дольше interval: новый запрос ждёт только target_delay
+        started_at = time.monotonic()
+        with pytest.raises(Overloaded) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "timeout"
+        assert time.monotonic() - started_at < 0.05
+        with pytest.raises(Overloaded):
+            await second
+
+    asyncio.run(scenario())
+
+
+def test_limit_grows_under_fast_saturation_and_backs_off_when_slow():
+    controller = AdmissionController(initial_limit=2, max_limit=4, interval=0)
+
+    async def saturate(latency, rounds):
+        for _ in range(rounds):
+            for _ in range(int(controller.limit)):
+                await controller.acquire()
+            for _ in range(controller.in_flight):
+                controller.release(latency)
+
+    asyncio.run(saturate(0.01, 20))
+    assert controller.limit == 4
+    asyncio.run(saturate(5.0, 1))
+    assert controller.limit < 4
+
+
+def test_middleware_rejects_with_503_and_lets_health_through():
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.get("/slow")
+    async def slow():
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(
+        AdmissionControlMiddleware,
+        controller=AdmissionController(initial_limit=1, max_queue=0),
+        route_priorities={"/health": "critical"},
+        retry_after=2,
+    )
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            running = asyncio.ensure_future(client.get("/slow"))
+            await asyncio.sleep(0.05)
+            rejected = await client.get("/slow")
+            health = await client.get("/health")
+            release.set()
+            assert (await running).status_code == 200
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "2"
+        assert health.status_code == 200
+
+    asyncio.run(scenario())
@@ -0,0 +1,47 @@
+# app/tests/test_auth_cache.py
+import asyncio
+import time
+
+import fakeredis
+
+from app.auth_cache import PrincipalCache
+
+
+def test_principal_is_cached_and_invalidated():
+    async def scenario():
+        cache = PrincipalCache(ttl=30)
+        await cache.set("alice", {"id": 1, "username": "alice", "role": "user"})
+        assert (await cache.get("alice"))["role"] == "user"
+        await cache.invalidate("alice")
+        assert await cache.get("alice") is None
+
+    asyncio.run(scenario())
+
+
+def test_revocation_only_affects_tokens_issued_before_it():
+    async def scenario():
+        cache = PrincipalCache()
+        issued_before = time.time() - 10
+        assert not await cache.is_revoked("alice", issued_before)
+        await cache.invalidate("alice")
+        assert await cache.is_revoked("alice", issued_before)
+        assert await cache.is_revoked("alice", None)
+        assert not await cache.is_revoked("alice", time.time() + 10)
+        assert not await cache.is_revoked("bob", issued_before)
+
+    asyncio.run(scenario())
+
+
+def test_redis_backing_is_shared_between_workers():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first = PrincipalCache(redis_client=redis_client)
+        second = PrincipalCache(redis_client=redis_client)
+        await first.set("alice", {"id": 1, "username": "alice", "role": "admin"})
+        assert (await second.get("alice"))["role"] == "admin"
+        await first.invalidate("alice")
+        second.local.clear()
+        assert await second.get("alice") is None
+        assert await second.is_revoked("alice", time.time() - 10)
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+# app/tests/test_broadcast.py
+import asyncio
+
+import fakeredis
+
+from app.broadcast import Broadcaster, InMemoryBroadcastBackend, RedisBroadcastBackend
+
+
+class RecordingManager:
+    def __init__(self):
+        self.messages = []
+
+    async def broadcast(self, message):
+        self.messages.append(message)
+
+
+class CountingBackend(InMemoryBroadcastBackend):
+    def __init__(self):
+        super().__init__()
+        self.published = 0
+
+    async def publish(self, channel, payload):
+        self.published += 1
+        await super().publish(channel, payload)
+
+
+async def wait_for(predicate, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.001)
+
+
+def test_messages_reach_every_worker_in_one_batch():
+    async def scenario():
+        backend = CountingBackend()
+        workers = [RecordingManager(), RecordingManager()]
+        broadcasters = [Broadcaster(backend, manager, flush_interval=0.01) for manager in workers]
+        for broadcaster in broadcasters:
+            await broadcaster.start()
+
+        for i in range(5):
+            await broadcasters[0].publish(f"m{i}")
+        await wait_for(lambda: all(len(manager.messages) == 5 for manager in workers))
+
+        assert backend.published == 1
+        assert workers[1].messages == ["m0", "m1", "m2", "m3", "m4"]
+        for broadcaster in broadcasters:
+            await broadcaster.stop()
+
+    asyncio.run(scenario())
+
+
+def test_full_batch_is_flushed_immediately():
+    async def scenario():
+        backend = CountingBackend()
+        manager = RecordingManager()
+        broadcaster = Broadcaster(backend, manager, flush_interval=60, max_batch=3)
+        await broadcaster.start()
+        for i in range(3):
+            await broadcaster.publish(str(i))
+        await wait_for(lambda: len(manager.messages) == 3)
+        await broadcaster.stop()
+
+    asyncio.run(scenario())
+
+
+def test_redis_backend_fans_out_between_workers():
+    async def scenario():
+        server = fakeredis.FakeServer()
+        first = RecordingManager()
+        second = RecordingManager()
+        broadcasters = [
+            Broadcaster(RedisBroadcastBackend(fakeredis.FakeAsyncRedis(server=server, decode_responses=True)), manager)
+            for manager in (first, second)
+        ]
+        for broadcaster in broadcasters:
+            await broadcaster.start()
+        await broadcasters[1].publish("привет")
+        await wait_for(lambda: first.messages == ["привет"] and second.messages == ["привет"])
+        for broadcaster in broadcasters:
+            await broadcaster.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,118 @@
+# app/tests/test_cache.py
+import asyncio
+
+import fakeredis
+
+from app.cache import CachedBody, LocalTTLCache, TwoTierCache, etag_matches
+
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalTTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_local_cache_expires_entries():
+    cache = LocalTTLCache(maxsize=2, ttl=0)
+    cache.set("a", 1)
+    assert cache.get("a") is None
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    async def scenario():
+        cache = TwoTierCache("notes", fakeredis.FakeAsyncRedis(decode_responses=True))
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return [{"id": 1}]
+
+        results = await asyncio.gather(*(cache.get_or_load(loader) for _ in range(20)))
+        assert calls == 1
+        assert all(result == [{"id": 1}] for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_does_not_fail_followers():
+    async def scenario():
+        cache = TwoTierCache("notes", fakeredis.FakeAsyncRedis(decode_responses=True))
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return [{"id": 1}]
+
+        leader = asyncio.ensure_future(cache.get_or_load(loader))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(cache.get_or_load(loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # Клиент первого запроса отключился
+        leader.cancel()
+        assert await asyncio.gather(*followers) == [[{"id": 1}]] * 3
+        assert leader.cancelled()
+        assert calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_bumps_version_and_reloads():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        cache = TwoTierCache("notes", redis_client)
+        data = [1]
+
+        async def loader():
+            return list(data)
+
+        assert await cache.get_or_load(loader) == [1]
+        data.append(2)
+        assert await cache.get_or_load(loader) == [1]
+        await cache.invalidate()
+        assert await redis_client.get("notes:version") == "1"
+        assert await cache.get_or_load(loader) == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_redis_tier_is_shared_between_workers():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        first = TwoTierCache("notes", redis_client)
+        second = TwoTierCache("notes", redis_client)
+
+        async def loader():
+            return ["fresh"]
+
+        async def failing_loader():
+            raise AssertionError("должно прийти из Redis")
+
+        await first.get_or_load(loader)
+        assert await second.get_or_load(failing_loader) == ["fresh"]
+
+    asyncio.run(scenario())
+
+
+def test_cached_body_roundtrip_keeps_etag():
+    entry = CachedBody.from_bytes(b'[{"id":1,"text":"a\\nb"}]')
+    restored = CachedBody.loads(CachedBody.dumps(entry))
+    assert restored == entry
+    assert entry.etag.startswith('"') and entry.etag.endswith('"')
+
+
+def test_etag_matches_handles_lists_and_weak_tags():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"zzz", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"zzz"', etag)
+    assert not etag_matches(None, etag)
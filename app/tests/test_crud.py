@@ -0,0 +1,45 @@
+# app/tests/test_crud.py
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import crud
+from app.schemas import NoteCreate
+
+
+def run_with_session(scenario):
+    async def runner():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+            await scenario(session)
+        await engine.dispose()
+
+    asyncio.run(runner())
+
+
+def test_bulk_create_returns_ids_in_order():
+    async def scenario(session):
+        ids = await crud.bulk_create_notes(session, [NoteCreate(text=f"n{i}") for i in range(5)])
+        assert ids == [1, 2, 3, 4, 5]
+        notes = await crud.get_all_notes(session)
+        assert [note.text for note in notes] == ["n0", "n1", "n2", "n3", "n4"]
+        assert await crud.bulk_create_notes(session, []) == []
+
+    run_with_session(scenario)
+
+
+def test_keyset_pages_cover_all_notes():
+    async def scenario(session):
+        await crud.bulk_create_notes(session, [NoteCreate(text=f"n{i}") for i in range(5)])
+        seen, after_id, has_more = [], None, True
+        while has_more:
+            page, has_more = await crud.get_notes_page(session, 2, after_id)
+            seen += [note.id for note in page]
+            after_id = page[-1].id
+        assert seen == [1, 2, 3, 4, 5]
+
+    run_with_session(scenario)
@@ -0,0 +1,87 @@
+# app/tests/test_feed.py
+import asyncio
+import json
+
+import fakeredis
+
+from app.feed import NoteFeed
+from app.websocket import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        self.received.append(json.loads(message))
+
+    async def close(self, code=1000):
+        pass
+
+
+def event(i):
+    return json.dumps({"type": "note.created", "note": {"id": i}})
+
+
+async def wait_for(predicate, timeout=1.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.001)
+
+
+def run_with_feed(scenario, history=1000):
+    async def runner():
+        feed = NoteFeed(fakeredis.FakeAsyncRedis(decode_responses=True), ConnectionManager(), history=history)
+        await feed.start()
+        try:
+            await scenario(feed)
+        finally:
+            await feed.stop()
+
+    asyncio.run(runner())
+
+
+def test_resume_replays_missed_events_then_live_ones():
+    async def scenario(feed):
+        assert await feed.publish([event(1), event(2), event(3)]) == 3
+        websocket = FakeWebSocket()
+        await feed.subscribe(websocket, since=1)
+        await feed.publish([event(4)])
+        await wait_for(lambda: len(websocket.received) == 4)
+        assert websocket.received[0] == {"type": "sync", "seq": 3}
+        assert [message["seq"] for message in websocket.received[1:]] == [2, 3, 4]
+        assert websocket.received[-1]["note"] == {"id": 4}
+
+    run_with_feed(scenario)
+
+
+def test_new_subscriber_gets_only_live_events():
+    async def scenario(feed):
+        await feed.publish([event(1)])
+        websocket = FakeWebSocket()
+        await feed.subscribe(websocket)
+        await feed.publish([event(2)])
+        await wait_for(lambda: len(websocket.received) == 2)
+        assert websocket.received == [
+            {"type": "sync", "seq": 1},
+            {"seq": 2, "type": "note.created", "note": {"id": 2}},
+        ]
+        feed.unsubscribe(websocket)
+        assert not feed.manager.active_connections
+
+    run_with_feed(scenario)
+
+
+def test_trimmed_history_asks_client_to_reset():
+    async def scenario(feed):
+        await feed.publish([event(i) for i in range(5)])
+        websocket = FakeWebSocket()
+        await feed.subscribe(websocket, since=1)
+        await wait_for(lambda: websocket.received)
+        assert websocket.received == [{"type": "reset", "seq": 5}]
+
+    run_with_feed(scenario, history=2)
@@ -0,0 +1,55 @@
+# app/tests/test_hashing.py
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from app.hashing import HashingPoolSaturated, PasswordHasher
+
+
+def test_hash_and_verify_in_process_pool():
+    async def scenario():
+        hasher = PasswordHasher(max_workers=1)
+        try:
+            hashed = await hasher.hash("secret")
+            assert await hasher.verify("secret", hashed)
+            assert not await hasher.verify("wrong", hashed)
+        finally:
+            hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_saturated_pool_fails_fast():
+    async def scenario():
+        hasher = PasswordHasher(max_workers=1, max_queue=0)
+        try:
+            hashed = await hasher.hash("secret")
+            results = await asyncio.gather(
+                hasher.verify("secret", hashed),
+                hasher.verify("secret", hashed),
+                return_exceptions=True,
+            )
+            assert results[0] is True
+            assert isinstance(results[1], HashingPoolSaturated)
+            assert hasher.in_flight == 0
+        finally:
+            hasher.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_broken_pool_is_replaced():
+    async def scenario():
+        hasher = PasswordHasher(max_workers=1)
+        try:
+            # Worker dies on every attempt: the call fails, but the pool is not left broken
+            with pytest.raises(BrokenProcessPool):
+                await hasher._run(os._exit, 1)
+            assert hasher.in_flight == 0
+            assert await hasher.verify("secret", await hasher.hash("secret"))
+        finally:
+            hasher.shutdown()
+
+    asyncio.run(scenario())
@@ -0,0 +1,90 @@
+# app/tests/test_instrumentation.py
+import asyncio
+import logging
+
+import fakeredis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.instrumentation import (
+    DB_QUERY_SECONDS,
+    REDIS_COMMAND_SECONDS,
+    REPEATED_QUERIES,
+    bind_shape,
+    fingerprint,
+    instrument_engine,
+    instrument_redis,
+    track_queries,
+)
+
+
+class FakeRoute:
+    path = "/notes/{note_id}"
+
+
+def count(histogram, label):
+    for sample in histogram.collect()[0].samples:
+        if sample.name.endswith(("_count", "_total")) and sample.labels.get(histogram._labelnames[0]) == label:
+            return sample.value
+    return 0
+
+
+def test_fingerprint_collapses_literals_and_parameter_lists():
+    assert fingerprint("SELECT *\n  FROM note WHERE id IN (?, ?, ?)") == "SELECT * FROM note WHERE id IN (...)"
+    assert fingerprint("SELECT * FROM note WHERE id IN ($1, $2)") == "SELECT * FROM note WHERE id IN (...)"
+    assert fingerprint("INSERT INTO note (text) VALUES (?), (?), (?)") == fingerprint("INSERT INTO note (text) VALUES (?)")
+    assert fingerprint("SELECT * FROM note_fts WHERE title = 'x' LIMIT 10") == "SELECT * FROM note_fts WHERE title = ? LIMIT ?"
+
+
+def test_engine_queries_are_timed_by_fingerprint():
+    async def scenario():
+        engine = instrument_engine(create_async_engine("sqlite+aiosqlite://"))
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 41 + 1"))
+            await conn.execute(text("SELECT 1 + 1"))
+        await engine.dispose()
+
+    before = count(DB_QUERY_SECONDS, "SELECT ? + ?")
+    asyncio.run(scenario())
+    assert count(DB_QUERY_SECONDS, "SELECT ? + ?") - before == 2
+
+
+def test_redis_commands_and_pipelines_are_timed():
+    async def scenario():
+        client = instrument_redis(fakeredis.FakeAsyncRedis(decode_responses=True))
+        assert instrument_redis(client) is client
+        await client.set("key", "value")
+        assert await client.get("key") == "value"
+        async with client.pipeline() as pipe:
+            pipe.get("key")
+            assert await pipe.execute() == ["value"]
+
+    before = {command: count(REDIS_COMMAND_SECONDS, command) for command in ("SET", "GET", "PIPELINE")}
+    asyncio.run(scenario())
+    assert {command: count(REDIS_COMMAND_SECONDS, command) - before[command] for command in before} == {"SET": 1, "GET": 1, "PIPELINE": 1}
+
+
+def test_slow_and_repeated_queries_are_logged_with_route(caplog):
+    async def scenario():
+        engine = instrument_engine(create_async_engine("sqlite+aiosqlite://"), slow_query_seconds=0)
+        with track_queries({"path": "/notes/1", "route": FakeRoute()}, repeat_threshold=3):
+            async with engine.connect() as conn:
+                for i in range(3):
+                    await conn.execute(text("SELECT :value"), {"value": i})
+        await engine.dispose()
+
+    before = count(REPEATED_QUERIES, "/notes/{note_id}")
+    with caplog.at_level(logging.WARNING, logger="app.sql"):
+        asyncio.run(scenario())
+
+    messages = [record.msg for record in caplog.records]
+    slow = [message for message in messages if message["event"] == "slow_query"]
+    assert len(slow) == 3
+    assert slow[0]["params"] == ["int"] and slow[0]["route"] == "/notes/{note_id}"
+    assert {"event": "repeated_query", "route": "/notes/{note_id}", "statement": "SELECT ?", "count": 3} in messages
+    assert count(REPEATED_QUERIES, "/notes/{note_id}") - before == 3
+
+
+def test_bind_shape_hides_values():
+    assert bind_shape({"id": 1, "ids": [1, 2]}, False) == {"id": "int", "ids": "list[2]"}
+    assert bind_shape([("a", 1), ("b", 2)], True) == {"rows": 2, "row": ["str", "int"]}
@@ -0,0 +1,52 @@
+# app/tests/test_log.py
+import io
+import json
+import logging
+
+from app.log import AsyncLogPipeline
+
+
+def test_pipeline_writes_json_lines_from_background_thread():
+    stream = io.StringIO()
+    logger = logging.getLogger("test.pipeline")
+    logger.setLevel(logging.INFO)
+    pipeline = AsyncLogPipeline(logger, stream=stream)
+    pipeline.start()
+    logger.info({"method": "GET", "status_code": 200})
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        logger.error({"error": "boom"}, exc_info=True)
+    pipeline.stop()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["message"] == {"method": "GET", "status_code": 200}
+    assert second["level"] == "ERROR"
+    assert "RuntimeError: boom" in second["trace"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    logger = logging.getLogger("test.pipeline.full")
+    logger.setLevel(logging.INFO)
+    pipeline = AsyncLogPipeline(logger, stream=io.StringIO(), queue_size=1)
+    # Поток записи не запущен: очередь переполняется сразу
+    logger.handlers = [pipeline.handler]
+    logger.propagate = False
+    for _ in range(3):
+        logger.info("x")
+    assert pipeline.dropped == 2
+
+
+def test_stopped_pipeline_writes_directly_and_restarts():
+    stream = io.StringIO()
+    logger = logging.getLogger("test.pipeline.restart")
+    logger.setLevel(logging.INFO)
+    pipeline = AsyncLogPipeline(logger, stream=stream)
+    pipeline.start()
+    pipeline.stop()
+    logger.info("after stop")
+    assert json.loads(stream.getvalue())["message"] == "after stop"
+
+    pipeline.start()
+    assert logger.handlers == [pipeline.handler]
+    pipeline.stop()
@@ -0,0 +1,95 @@
+# app/tests/test_mail.py
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app import mail, tasks
+
+
+class RecordingHandler:
+    def __init__(self, refuse=()):
+        self.refuse = set(refuse)
+        self.recipients = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.refuse:
+            return "550 mailbox unavailable"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_with_smtp(scenario, refuse=()):
+    handler = RecordingHandler(refuse)
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    pool = mail.SMTPPool("127.0.0.1", controller.port, size=1)
+    try:
+        scenario(pool, handler)
+    finally:
+        pool.close()
+        controller.stop()
+
+
+def test_batches_reuse_one_connection():
+    def scenario(pool, handler):
+        mail.send_batch(pool, "noreply@example.com", ["a@example.com", "b@example.com"])
+        sent, failed = mail.send_batch(pool, "noreply@example.com", ["c@example.com"])
+        assert sent == ["c@example.com"] and failed == {}
+        assert handler.recipients == ["a@example.com", "b@example.com", "c@example.com"]
+        assert pool.opened == 1
+
+    run_with_smtp(scenario)
+
+
+def test_refused_recipient_does_not_stop_the_batch():
+    def scenario(pool, handler):
+        sent, failed = mail.send_batch(pool, "noreply@example.com", ["a@example.com", "bad@example.com", "c@example.com"])
+        assert sent == ["a@example.com", "c@example.com"]
+        assert list(failed) == ["bad@example.com"]
+
+    run_with_smtp(scenario, refuse=["bad@example.com"])
+
+
+def test_batch_task_reports_counts(monkeypatch):
+    def scenario(pool, handler):
+        monkeypatch.setattr(tasks, "_smtp_pool", pool)
+        result = tasks.send_email_batch.apply(args=[["a@example.com", "bad@example.com"]]).get()
+        assert result == {"sent": 1, "failed": {"bad@example.com": result["failed"]["bad@example.com"]}}
+
+    run_with_smtp(scenario, refuse=["bad@example.com"])
+
+
+def test_batch_task_keeps_results_of_earlier_attempts(monkeypatch):
+    def scenario(pool, handler):
+        monkeypatch.setattr(tasks, "_smtp_pool", pool)
+        result = tasks.send_email_batch.apply(
+            args=[["c@example.com", "bad@example.com"]],
+            kwargs={"sent_before": 2, "failed_before": {"old@example.com": "550 earlier"}},
+        ).get()
+        assert result["sent"] == 3
+        assert list(result["failed"]) == ["old@example.com", "bad@example.com"]
+
+    run_with_smtp(scenario, refuse=["bad@example.com"])
+
+
+def test_connection_is_not_reused_after_an_unexpected_error():
+    def scenario(pool, handler):
+        with pytest.raises(ValueError):
+            with pool.connection():
+                raise ValueError("bug in the caller")
+        mail.send_batch(pool, "noreply@example.com", ["a@example.com"])
+        assert pool.opened == 2
+        assert pool._idle.qsize() == 1
+
+    run_with_smtp(scenario)
@@ -0,0 +1,79 @@
+# app/tests/test_main.py
+import importlib
+import json
+
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    # Движок и middleware создаются из settings при импорте и первом запуске: временная SQLite-база и fakeredis
+    redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(settings, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path_factory.mktemp('main') / 'notes.db'}")
+        patch.setattr(settings, "DATABASE_REPLICA_URLS", [])
+        patch.setattr(settings, "RATE_LIMIT_REQUESTS", 1000)
+        patch.setattr(settings, "ADMISSION_ENABLED", False)
+        patch.setattr(settings, "NOTES_WRITE_BUFFER", False)
+        patch.setattr(settings, "NOTES_BULK_BATCH_SIZE", 2)
+        module = importlib.import_module("app.main")
+        patch.setattr(module, "create_redis_client", lambda *args, **kwargs: redis_client)
+        yield module
+
+
+@pytest.fixture(scope="module")
+def client(main):
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_notes_etag_and_not_modified(client):
+    client.post("/notes", json={"text": "first"})
+    first = client.get("/notes")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.json()[-1]["text"] == "first"
+
+    not_modified = client.get("/notes", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+
+    # Запись меняет список, а значит и ETag
+    client.post("/notes", json={"text": "second"})
+    changed = client.get("/notes", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_bulk_ndjson_reports_the_invalid_line(client):
+    lines = [json.dumps({"text": f"bulk {i}"}) for i in range(3)] + ["", '{"text": 1', json.dumps({"text": "never"})]
+    response = client.post(
+        "/notes/bulk",
+        content="\n".join(lines).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 422
+    detail = response.json()["detail"]
+    assert detail["line"] == 5
+    # Пачка из двух уже вставлена до ошибки, третья заметка ещё копилась
+    assert len(detail["inserted_ids"]) == 2
+
+    texts = [note["text"] for note in client.get("/notes").json()]
+    assert "bulk 1" in texts and "bulk 2" not in texts and "never" not in texts
+
+
+def test_bulk_ndjson_inserts_every_line(client):
+    lines = [json.dumps({"text": f"ok {i}"}) for i in range(5)]
+    response = client.post(
+        "/notes/bulk",
+        content="\n".join(lines).encode(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 5
+    assert len(set(response.json()["ids"])) == 5
@@ -0,0 +1,74 @@
+# app/tests/test_middleware.py
+import logging
+
+import fakeredis
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.access_log import AccessLogMiddleware
+from app.middleware.rate_limiter import RateLimiterMiddleware, RateLimitRule
+
+
+def make_app():
+    app = FastAPI()
+    app.state.redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    app.state.calls = 0
+
+    @app.get("/notes")
+    async def notes():
+        app.state.calls += 1
+
+        async def chunks():
+            yield b"["
+            yield b'{"id":1}'
+            yield b"]"
+
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    app.add_middleware(RateLimiterMiddleware, default_rule=RateLimitRule(2, 60), route_rules={})
+    app.add_middleware(AccessLogMiddleware, logger=logging.getLogger("test.access"))
+    return app
+
+
+def test_streamed_body_is_passed_through():
+    app = make_app()
+    with TestClient(app) as client:
+        response = client.get("/notes")
+    assert response.content == b'[{"id":1}]'
+    assert response.headers["RateLimit-Remaining"] == "1"
+
+
+def test_rate_limit_headers_and_rejection():
+    app = make_app()
+    with TestClient(app) as client:
+        responses = [client.get("/health") for _ in range(3)]
+    assert responses[0].headers["RateLimit-Remaining"] == "1"
+    assert responses[2].status_code == 429
+    assert responses[2].headers["Retry-After"]
+
+
+def test_access_log_records_status(caplog):
+    app = make_app()
+    with caplog.at_level(logging.INFO, logger="test.access"), TestClient(app) as client:
+        client.get("/missing")
+    assert caplog.records[-1].msg["status_code"] == 404
+
+
+def test_access_log_sampling_keeps_errors(caplog):
+    app = FastAPI()
+
+    @app.get("/ok")
+    async def ok():
+        return {}
+
+    @app.get("/fail")
+    async def fail():
+        return JSONResponse(status_code=503, content={})
+
+    app.add_middleware(AccessLogMiddleware, logger=logging.getLogger("test.sampled"), sample_rate=0.0)
+    with caplog.at_level(logging.INFO, logger="test.sampled"), TestClient(app) as client:
+        for _ in range(5):
+            client.get("/ok")
+        client.get("/fail")
+    assert [record.msg["status_code"] for record in caplog.records] == [503]
@@ -0,0 +1,114 @@
+# app/tests/test_notes_api_final.py
+import importlib
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    # Engine and settings are read at import time, so the module is imported against a temporary database
+    with pytest.MonkeyPatch.context() as env:
+        env.setenv("DATABASE_URL", f"sqlite:///{tmp_path_factory.mktemp('notes_api') / 'notes.db'}")
+        env.setenv("HASH_POOL_WORKERS", "1")
+        env.delenv("NOTES_REDIS_URL", raising=False)
+        env.delenv("TRUST_TOKEN_CLAIMS", raising=False)
+        env.delenv("NOTES_DB_REPLICA_URLS", raising=False)
+        env.delenv("NOTES_RESPONSE_CACHE", raising=False)
+        module = importlib.import_module("app.notes_api_final")
+    return module
+
+
+@pytest.fixture(scope="module")
+def client(api):
+    with TestClient(api.app) as client:
+        yield client
+
+
+def login(client, username, password="secret"):
+    client.post("/register", json={"username": username, "password": password})
+    response = client.post("/login", data={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_register_login_and_note_crud(client):
+    headers = login(client, "alice")
+    assert client.get("/users/me", headers=headers).json()["username"] == "alice"
+    assert client.post("/login", data={"username": "alice", "password": "wrong"}).status_code == 401
+
+    created = client.post("/notes", json={"title": "milk", "content": "buy milk"}, headers=headers).json()
+    first = client.get("/notes", headers=headers)
+    second = client.get("/notes", headers=headers)
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == [created]
+    assert client.get(f"/notes/{created['id']}", headers=headers).json() == created
+
+    # A write drops the user's cached pages
+    client.put(f"/notes/{created['id']}", json={"title": "bread", "content": "buy bread"}, headers=headers)
+    updated = client.get("/notes", headers=headers)
+    assert updated.headers["X-Cache"] == "MISS"
+    assert updated.json()[0]["title"] == "bread"
+    assert client.get("/notes", params={"search": "bread"}, headers=headers).json()[0]["id"] == created["id"]
+
+    assert client.delete(f"/notes/{created['id']}", headers=headers).status_code == 200
+    assert client.get(f"/notes/{created['id']}", headers=headers).status_code == 404
+    assert client.get("/notes", headers=headers).json() == []
+
+
+def test_notes_are_private_and_auth_is_required(client):
+    alice = login(client, "alice")
+    bob = login(client, "bob")
+    note = client.post("/notes", json={"title": "secret", "content": "alice only"}, headers=alice).json()
+    assert client.get(f"/notes/{note['id']}", headers=bob).status_code == 404
+    assert client.get("/notes", headers=bob).json() == []
+    assert client.get("/notes").status_code == 401
+
+
+def test_role_update_accepts_known_roles_and_revokes_old_claims(api, client):
+    async def promote(username):
+        async with api.async_session() as session:
+            user = (await session.exec(api.select(api.User).where(api.User.username == username))).first()
+            user.role = "admin"
+            session.add(user)
+            await session.commit()
+            return user.id
+
+    login(client, "root")
+    admin_id = client.portal.call(promote, "root")
+    admin = login(client, "root")
+    assert client.get("/admin/users", headers=admin).status_code == 200
+
+    assert client.put(f"/admin/users/{admin_id}/role", json={"role": "amdin"}, headers=admin).status_code == 422
+    demoted = client.put(f"/admin/users/{admin_id}/role", json={"role": "user"}, headers=admin)
+    assert demoted.json()["role"] == "user"
+    assert client.get("/admin/users", headers=admin).status_code == 403
+
+
+def test_token_claims_are_not_trusted_without_shared_revocations(api):
+    assert api.REDIS_URL is None
+    assert api.TRUST_TOKEN_CLAIMS is False
+
+
+def test_slow_query_log_goes_through_the_async_pipeline(api, client):
+    sql_logger = logging.getLogger("app.sql")
+    assert api.sql_log_pipeline.handler in sql_logger.handlers
+    assert not sql_logger.propagate
+
+
+def test_cache_misses_read_through_the_replica_router(api, client, monkeypatch):
+    headers = login(client, "carol")
+    client.post("/notes", json={"title": "tea", "content": "buy tea"}, headers=headers)
+    routed = []
+    session = api.router.session
+
+    def spy(read_only=False, key=None):
+        routed.append((read_only, key))
+        return session(read_only=read_only, key=key)
+
+    monkeypatch.setattr(api.router, "session", spy)
+    assert client.get("/notes", headers=headers).headers["X-Cache"] == "MISS"
+    # The read session is keyed by the client, so its own recent write pins it to the primary
+    assert (True, headers["Authorization"]) in routed
@@ -0,0 +1,86 @@
+# app/tests/test_profiler.py
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+
+from app import profiler
+from app.response_cache import ResponseCache
+
+
+def busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def idle(seconds):
+    time.sleep(seconds)
+
+
+def test_only_stacks_through_target_code_are_kept():
+    sampler = profiler.SamplingProfiler(interval=0.001, codes={busy.__code__})
+    sampler.start()
+    busy(0.05)
+    idle(0.05)
+    sampler.stop()
+
+    names = {sampler.frames[i][0] for stack in sampler.stacks for i in stack}
+    assert sampler.samples > 0
+    assert "busy" in names and "idle" not in names
+
+    speedscope = sampler.speedscope("busy")
+    samples = speedscope["profiles"][0]["samples"]
+    assert len(samples) == len(speedscope["profiles"][0]["weights"])
+    assert all(speedscope["shared"]["frames"][stack[-1]]["name"] for stack in samples)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in sampler.collapsed().splitlines())
+
+
+def test_route_codes_match_path_and_method():
+    app = FastAPI()
+
+    @app.get("/notes")
+    async def list_notes():
+        return []
+
+    @app.post("/notes")
+    async def add_note():
+        return {}
+
+    assert profiler.route_codes(app, "/notes") == {list_notes.__code__, add_note.__code__}
+    assert profiler.route_codes(app, "/notes", "get") == {list_notes.__code__}
+    assert profiler.route_codes(app, "/missing") == set()
+
+
+def test_route_codes_unwrap_decorated_endpoints():
+    app = FastAPI()
+    cache = ResponseCache()
+
+    @app.get("/notes")
+    @cache.cached(lambda **_: "all")
+    async def list_notes():
+        return []
+
+    @app.get("/users")
+    @cache.cached(lambda **_: "all")
+    async def list_users():
+        return []
+
+    notes = profiler.route_codes(app, "/notes")
+    users = profiler.route_codes(app, "/users")
+    assert notes == {list_notes.__wrapped__.__code__}
+    assert users == {list_users.__wrapped__.__code__}
+    assert notes != users
+
+
+def test_one_session_at_a_time():
+    async def scenario():
+        first = asyncio.create_task(profiler.profile(0.05, interval=0.001))
+        await asyncio.sleep(0.01)
+        with pytest.raises(profiler.ProfilerBusy):
+            await profiler.profile(0.01)
+        result = await first
+        assert result.duration > 0
+
+    asyncio.run(scenario())
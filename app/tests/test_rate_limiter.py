@@ -0,0 +1,56 @@
+# app/tests/test_rate_limiter.py
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.middleware.rate_limiter import RateLimiter, RateLimiterMiddleware, RateLimitRule
+
+
+@pytest.mark.parametrize("algorithm", ["fixed_window", "sliding_window", "token_bucket"])
+def test_limit_is_enforced_under_concurrency(algorithm):
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        limiter = RateLimiter()
+        rule = RateLimitRule(limit=5, window=60, algorithm=algorithm)
+        results = await asyncio.gather(*(limiter.hit(redis_client, "ratelimit:test", rule) for _ in range(20)))
+        assert sum(result.allowed for result in results) == 5
+        denied = [result for result in results if not result.allowed]
+        assert all(result.headers["Retry-After"] for result in denied)
+        assert all(0 < result.reset_ms <= 60_000 for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_remaining_counts_down():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        limiter = RateLimiter()
+        rule = RateLimitRule(limit=3, window=60)
+        remaining = [(await limiter.hit(redis_client, "k", rule)).remaining for _ in range(3)]
+        assert remaining == [2, 1, 0]
+
+    asyncio.run(scenario())
+
+
+def test_rule_parsing_and_validation():
+    assert RateLimitRule.parse("10/60") == RateLimitRule(10, 60, "fixed_window")
+    assert RateLimitRule.parse("10/60/token_bucket").algorithm == "token_bucket"
+    with pytest.raises(ValueError):
+        RateLimitRule(1, 1, "leaky")
+
+
+def test_route_rules_prefer_longest_matching_prefix():
+    middleware = RateLimiterMiddleware(
+        app=None,
+        default_rule=RateLimitRule(5, 60),
+        route_rules={
+            "/notes": RateLimitRule(100, 60),
+            "POST /notes/bulk": RateLimitRule(1, 60),
+        },
+    )
+    assert middleware.resolve_rule("GET", "/notes")[1].limit == 100
+    assert middleware.resolve_rule("GET", "/notes/stream")[1].limit == 100
+    assert middleware.resolve_rule("POST", "/notes/bulk")[1].limit == 1
+    assert middleware.resolve_rule("GET", "/notes/bulk")[1].limit == 100
+    assert middleware.resolve_rule("GET", "/notesx")[1].limit == 5
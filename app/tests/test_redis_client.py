@@ -0,0 +1,144 @@
+# app/tests/test_redis_client.py
+import asyncio
+
+import fakeredis
+import pytest
+import redis.asyncio as redis
+from prometheus_client import REGISTRY
+
+from app.cache import TwoTierCache
+from app.instrumentation import instrument_redis
+from app.middleware.rate_limiter import RateLimiter, RateLimitRule
+from app.redis_client import InstrumentedConnectionPool, RedisBatcher
+
+
+def metric(name):
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+def pipelines():
+    return REGISTRY.get_sample_value("app_redis_command_seconds_count", {"command": "PIPELINE"}) or 0.0
+
+
+def test_commands_in_one_tick_share_a_pipeline():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        await redis_client.set("a", "1")
+        batcher = RedisBatcher(redis_client)
+        first = batcher.execute_command("GET", "a")
+        second = batcher.execute_command("INCR", "b")
+        wrong_type = batcher.execute_command("LPUSH", "a", "x")
+        assert await first == "1"
+        assert await second == 1
+        with pytest.raises(redis.ResponseError):
+            await wrong_type
+        assert batcher.round_trips == 1
+
+        assert await batcher.execute_command("GET", "b") == "1"
+        assert batcher.round_trips == 2
+
+    asyncio.run(scenario())
+
+
+def test_flush_task_is_held_until_done():
+    async def scenario():
+        batcher = RedisBatcher(fakeredis.FakeAsyncRedis(decode_responses=True))
+        result = batcher.execute_command("INCR", "a")
+        await asyncio.sleep(0)
+        assert len(batcher._tasks) == 1
+        assert await result == 1
+        await asyncio.gather(*batcher._tasks)
+        assert not batcher._tasks
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_and_cache_read_are_one_round_trip():
+    async def scenario():
+        redis_client = instrument_redis(fakeredis.FakeAsyncRedis(decode_responses=True))
+        cache = TwoTierCache("notes", redis_client, local_ttl=0)
+
+        async def loader():
+            return ["note"]
+
+        await cache.get_or_load(loader)
+        limiter = RateLimiter()
+        rule = RateLimitRule(limit=5, window=60)
+        # Первый вызов загружает скрипты в Redis; дальше считаем pipeline
+        for _ in range(2):
+            before = pipelines()
+            batcher = RedisBatcher(redis_client)
+            prefetched = cache.prefetch(batcher)
+            result = await limiter.hit(redis_client, "ratelimit:test", rule, batcher)
+            value = await cache.get_or_load(loader, prefetched=prefetched)
+        assert result.allowed
+        assert value == ["note"]
+        assert batcher.round_trips == 1
+        assert pipelines() - before == 1
+
+    asyncio.run(scenario())
+
+
+def test_prefetch_is_skipped_on_local_hit():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        cache = TwoTierCache("notes", redis_client)
+
+        async def loader():
+            return [1]
+
+        await cache.get_or_load(loader)
+        assert cache.prefetch(RedisBatcher(redis_client)) is None
+
+    asyncio.run(scenario())
+
+
+def test_pool_is_bounded_and_exports_metrics():
+    async def scenario():
+        pool = InstrumentedConnectionPool(
+            connection_class=fakeredis.aioredis.FakeAsyncRedisConnection,
+            server=fakeredis.FakeServer(),
+            max_connections=2,
+            timeout=0.05,
+        )
+        redis_client = redis.Redis(connection_pool=pool)
+        assert metric("app_redis_pool_max_connections") == 2
+
+        exhausted = metric("app_redis_pool_exhausted_total")
+        first = await pool.get_connection()
+        second = await pool.get_connection()
+        assert metric("app_redis_pool_connections_in_use") == 2
+        with pytest.raises(redis.ConnectionError):
+            await redis_client.ping()
+        assert metric("app_redis_pool_exhausted_total") == exhausted + 1
+
+        await pool.release(first)
+        await pool.release(second)
+        assert metric("app_redis_pool_connections_in_use") == 0
+        assert await redis_client.ping()
+        await redis_client.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_prefetch_read_before_invalidate_is_not_kept_locally():
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        cache = TwoTierCache("notes", redis_client)
+        loads = []
+
+        async def loader():
+            loads.append(1)
+            return [len(loads)]
+
+        await cache.get_or_load(loader)
+        cache.local.clear()
+        prefetched = cache.prefetch(RedisBatcher(redis_client))
+        # Чтение из Redis завершилось до инвалидации, get_or_load вызван уже после неё
+        await prefetched.read
+        await cache.invalidate()
+        assert await cache.get_or_load(loader, prefetched=prefetched) == [1]
+        assert cache.local.get("all") is None
+        assert await cache.get_or_load(loader) == [2]
+
+    asyncio.run(scenario())
@@ -0,0 +1,131 @@
+# app/tests/test_replicas.py
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import crud
+from app.replicas import ReplicaRouter
+from app.schemas import NoteCreate
+
+
+def run_with_databases(tmp_path, scenario, replicas=1):
+    # Две (или больше) локальные базы: на "реплике" своё содержимое, чтобы было видно, куда ушло чтение
+    async def runner():
+        primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+        engines = [create_async_engine(f"sqlite+aiosqlite:///{tmp_path / f'replica{i}.db'}") for i in range(replicas)]
+        for engine in [primary, *engines]:
+            async with engine.begin() as conn:
+                await conn.run_sync(SQLModel.metadata.create_all)
+        router = ReplicaRouter(primary, engines, sticky_seconds=60)
+        async with router.session() as session:
+            await crud.bulk_create_notes(session, [NoteCreate(text="primary")])
+        for i, engine in enumerate(engines):
+            async with router.replicas[i].factory() as session:
+                await crud.bulk_create_notes(session, [NoteCreate(text=f"replica{i}")])
+        await scenario(router)
+        await router.stop()
+        await primary.dispose()
+
+    asyncio.run(runner())
+
+
+async def read_text(router, key=None):
+    async with router.session(read_only=True, key=key) as session:
+        return [note.text for note in await crud.get_all_notes(session)][0]
+
+
+def test_reads_go_to_replica_and_writes_to_primary(tmp_path):
+    async def scenario(router):
+        assert await read_text(router) == "replica0"
+        async with router.session() as session:
+            assert [note.text for note in await crud.get_all_notes(session)] == ["primary"]
+
+    run_with_databases(tmp_path, scenario)
+
+
+def test_client_reads_its_own_writes_from_primary(tmp_path):
+    async def scenario(router):
+        router.mark_write("alice")
+        assert await read_text(router, "alice") == "primary"
+        assert await read_text(router, "bob") == "replica0"
+
+    run_with_databases(tmp_path, scenario)
+
+
+def test_round_robin_and_least_connections(tmp_path):
+    async def scenario(router):
+        assert [await read_text(router) for _ in range(4)] == ["replica0", "replica1", "replica0", "replica1"]
+
+        router.strategy = "least_connections"
+        async with router.session(read_only=True):
+            busy = [replica for replica in router.replicas if replica.in_use]
+            assert len(busy) == 1
+            idle = next(replica for replica in router.replicas if not replica.in_use)
+            assert router.choose()[0] is idle
+
+    run_with_databases(tmp_path, scenario, replicas=2)
+
+
+def test_unhealthy_replica_falls_back_to_primary(tmp_path):
+    async def scenario(router):
+        broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+        router.replicas[0].engine = broken
+        assert await router.check_health() == {router.replicas[0].name: False}
+        assert router.choose() == (None, "fallback")
+        assert await read_text(router) == "primary"
+
+    run_with_databases(tmp_path, scenario)
+
+
+def test_unreachable_replica_serves_first_read_from_primary(tmp_path):
+    async def scenario(router):
+        # Проверка ещё не заметила недоступность: ошибка подключения всплывает на самом чтении
+        broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+        router.replicas[0].factory = sessionmaker(broken, class_=AsyncSession, expire_on_commit=False)
+        assert router.replicas[0].healthy
+        assert await read_text(router) == "primary"
+        assert not router.replicas[0].healthy
+        assert router.replicas[0].in_use == 0
+        await broken.dispose()
+
+    run_with_databases(tmp_path, scenario)
+
+
+def test_query_error_does_not_mark_replica_down(tmp_path):
+    async def scenario(router):
+        with pytest.raises(OperationalError):
+            async with router.session(read_only=True) as session:
+                await session.execute(text("SELECT * FROM missing_table"))
+        assert router.replicas[0].healthy
+        assert await read_text(router) == "replica0"
+
+    run_with_databases(tmp_path, scenario)
+
+
+class HangingEngine:
+    # Подключение к "чёрной дыре": connect не отвечает дольше таймаута проверки
+    @asynccontextmanager
+    async def connect(self):
+        await asyncio.sleep(10)
+        yield
+
+    async def dispose(self):
+        pass
+
+
+def test_health_check_times_out_on_hanging_connect(tmp_path):
+    async def scenario(router):
+        router.health_timeout = 0.05
+        router.replicas[0].engine = HangingEngine()
+        started_at = time.monotonic()
+        assert await router.check_health() == {router.replicas[0].name: False}
+        assert time.monotonic() - started_at < 1
+
+    run_with_databases(tmp_path, scenario)
@@ -0,0 +1,120 @@
+# app/tests/test_response_cache.py
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import fakeredis
+import pytest
+from fastapi import Depends, FastAPI, Header, Response
+from fastapi.testclient import TestClient
+
+from app.response_cache import CachedResponse, ResponseCache
+
+
+def make_app(cache: ResponseCache):
+    app = FastAPI()
+    app.state.loads = 0
+    app.state.sessions = []
+
+    def current_user(x_user: str = Header(...)) -> str:
+        return x_user
+
+    async def get_session():
+        yield "request-session"
+
+    @asynccontextmanager
+    async def fresh_session():
+        yield "background-session"
+
+    def user_tag(user: str, **_) -> str:
+        return f"user:{user}"
+
+    @app.get("/notes")
+    @cache.cached(user_tag, params=("search", "limit"), session_param="session", session_factory=fresh_session)
+    async def notes(search: Optional[str] = None, limit: int = 10, user: str = Depends(current_user), session=Depends(get_session)):
+        app.state.loads += 1
+        app.state.sessions.append(session)
+        return Response(content=f'{{"user":"{user}","load":{app.state.loads}}}', media_type="application/json")
+
+    @app.post("/notes")
+    async def create(user: str = Depends(current_user)):
+        await cache.invalidate(user_tag(user))
+        return {"ok": True}
+
+    return app
+
+
+@pytest.fixture(params=["local", "redis"])
+def cache(request):
+    redis_client = fakeredis.FakeAsyncRedis(decode_responses=True) if request.param == "redis" else None
+    return ResponseCache(ttl=60, stale_ttl=60, redis_client=redis_client)
+
+
+def test_cached_per_user_and_normalized_params(cache):
+    app = make_app(cache)
+    with TestClient(app) as client:
+        first = client.get("/notes", params={"search": " rust  async"}, headers={"X-User": "alice"})
+        second = client.get("/notes", params={"search": "rust async"}, headers={"X-User": "alice"})
+        other = client.get("/notes", params={"search": "rust async"}, headers={"X-User": "bob"})
+    assert first.headers["X-Cache"] == "MISS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.json() == first.json() == {"user": "alice", "load": 1}
+    assert second.headers["content-type"] == "application/json"
+    assert other.json() == {"user": "bob", "load": 2}
+
+
+def test_write_invalidates_only_that_users_tag(cache):
+    app = make_app(cache)
+    with TestClient(app) as client:
+        client.get("/notes", headers={"X-User": "alice"})
+        client.get("/notes", headers={"X-User": "bob"})
+        client.post("/notes", headers={"X-User": "alice"})
+        alice = client.get("/notes", headers={"X-User": "alice"})
+        bob = client.get("/notes", headers={"X-User": "bob"})
+    assert alice.headers["X-Cache"] == "MISS"
+    assert bob.headers["X-Cache"] == "HIT"
+    assert app.state.loads == 3
+
+
+def test_stale_entry_is_served_while_revalidating(cache):
+    app = make_app(cache)
+    with TestClient(app) as client:
+        client.get("/notes", headers={"X-User": "alice"})
+        cache.ttl = 0
+        stale = client.get("/notes", headers={"X-User": "alice"})
+        # The background reload runs on the client's event loop
+        client.portal.call(asyncio.sleep, 0.05)
+        cache.ttl = 60
+        refreshed = client.get("/notes", headers={"X-User": "alice"})
+    assert stale.headers["X-Cache"] == "STALE"
+    assert stale.json()["load"] == 1
+    assert refreshed.headers["X-Cache"] == "HIT"
+    assert refreshed.json()["load"] == 2
+    assert app.state.sessions == ["request-session", "background-session"]
+
+
+def test_load_that_straddles_an_invalidation_is_not_stored(cache):
+    async def scenario():
+        version, _ = await cache.read("user:alice", "page")
+        await cache.invalidate("user:alice")
+        entry = CachedResponse(0.0, b"[]", {})
+        assert not await cache.write("user:alice", version, "page", entry)
+        assert await cache.read("user:alice", "page") == (str(int(version) + 1), None)
+        if cache.redis is not None:
+            assert await cache.redis.keys("*:v0:*") == []
+
+        version, _ = await cache.read("user:alice", "page")
+        assert await cache.write("user:alice", version, "page", entry)
+        assert (await cache.read("user:alice", "page"))[1] == entry
+
+    asyncio.run(scenario())
+
+
+def test_disabled_cache_leaves_the_endpoint_as_is():
+    cache = ResponseCache(enabled=False)
+    app = make_app(cache)
+    with TestClient(app) as client:
+        first = client.get("/notes", headers={"X-User": "alice"})
+        second = client.get("/notes", headers={"X-User": "alice"})
+    assert "X-Cache" not in second.headers
+    assert (first.json()["load"], second.json()["load"]) == (1, 2)
@@ -0,0 +1,11 @@
+# app/tests/test_routes.py
+from app.middleware.routes import match_route, sort_routes
+
+
+def test_longest_prefix_and_method_win():
+    routes = sort_routes({"POST /notes": "post", "/notes": "any", "/notes/export": "export", "/": "root"})
+    assert match_route(routes, "POST", "/notes") == ("POST /notes", "post")
+    assert match_route(routes, "GET", "/notes/1") == ("/notes", "any")
+    assert match_route(routes, "GET", "/notes/export/csv") == ("/notes/export", "export")
+    assert match_route(routes, "GET", "/notesx") == ("/", "root")
+    assert match_route(sort_routes({"/notes": "any"}), "GET", "/users") is None
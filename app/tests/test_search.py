@@ -0,0 +1,58 @@
+# app/tests/test_search.py
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, select, update
+
+from app.search import apply_search, fts5_query, install_search, uninstall_search
+
+metadata = MetaData()
+notes = Table(
+    "note",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String),
+    Column("content", String),
+    Column("owner_id", Integer),
+)
+
+
+def search(connection, query, owner_id=1, dialect="sqlite"):
+    statement = select(notes.c.id).where(notes.c.owner_id == owner_id)
+    return [row.id for row in connection.execute(apply_search(statement, notes.c, dialect, query))]
+
+
+def test_fts5_query_quotes_user_input():
+    assert fts5_query('milk "bread') == '"milk" """bread"'
+
+
+def test_sqlite_fts_is_ranked_and_kept_in_sync():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        metadata.create_all(connection)
+        connection.execute(insert(notes), [
+            {"title": "shopping", "content": "milk bread", "owner_id": 1},
+            {"title": "milk", "content": "milk milk milk", "owner_id": 1},
+            {"title": "other", "content": "milk", "owner_id": 2},
+        ])
+        install_search(connection)
+        # Повторная установка ничего не ломает
+        install_search(connection)
+
+        assert search(connection, "milk") == [2, 1]
+        assert search(connection, "milk bread") == [1]
+        assert search(connection, '"unbalanced (') == []
+
+        connection.execute(update(notes).where(notes.c.id == 1).values(content="bread only"))
+        assert search(connection, "milk") == [2]
+
+        uninstall_search(connection)
+
+
+def test_ilike_fallback_requires_every_word():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        metadata.create_all(connection)
+        connection.execute(insert(notes), [
+            {"title": "bread", "content": "and milk", "owner_id": 1},
+            {"title": "milk", "content": "only", "owner_id": 1},
+        ])
+        assert search(connection, "milk bread", dialect="ilike") == [1]
+        assert search(connection, "MILK", dialect="ilike") == [1, 2]
@@ -0,0 +1,63 @@
+# app/tests/test_task_backend.py
+import asyncio
+
+import pytest
+
+from app.task_backend import TASK_EVENTS, AsyncioTaskBackend, TaskQueueFull
+
+
+def test_concurrency_is_bounded_and_drain_finishes_queued_jobs():
+    async def scenario():
+        backend = AsyncioTaskBackend(concurrency=2)
+        running, peak, done = 0, 0, []
+
+        async def job(i):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            done.append(i)
+
+        await backend.start()
+        for i in range(6):
+            await backend.submit(job, i)
+        await backend.stop()
+        assert sorted(done) == list(range(6))
+        assert peak == 2
+        with pytest.raises(TaskQueueFull):
+            await backend.submit(job, 7)
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_is_retried():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("boom")
+
+    async def scenario():
+        backend = AsyncioTaskBackend(concurrency=1, max_retries=3, retry_delay=0)
+        await backend.start()
+        await backend.submit(flaky)
+        await backend.stop()
+
+    before = TASK_EVENTS.labels("flaky", "retried")._value.get()
+    asyncio.run(scenario())
+    assert len(attempts) == 3
+    assert TASK_EVENTS.labels("flaky", "retried")._value.get() - before == 2
+
+
+def test_full_queue_rejects_new_jobs():
+    async def scenario():
+        backend = AsyncioTaskBackend(max_queue=1)
+        await backend.submit(asyncio.sleep, 0)
+        with pytest.raises(TaskQueueFull):
+            await backend.submit(asyncio.sleep, 0)
+        await backend.start()
+        await backend.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,97 @@
+# app/tests/test_websocket.py
+import asyncio
+
+from app.websocket import DISCONNECT, DROP_OLDEST, ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await self.gate.wait()
+        if self.fail:
+            raise RuntimeError("socket is dead")
+        await asyncio.sleep(self.delay)
+        self.received.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_broadcast_does_not_wait_for_slow_clients():
+    async def scenario():
+        manager = ConnectionManager()
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=10)
+        await manager.connect(fast)
+        await manager.connect(slow)
+        await asyncio.wait_for(manager.broadcast("hi"), timeout=0.1)
+        await settle()
+        assert fast.received == ["hi"]
+        assert slow.received == []
+        manager.disconnect(slow)
+
+    asyncio.run(scenario())
+
+
+def test_dead_socket_is_removed_without_breaking_broadcast():
+    async def scenario():
+        manager = ConnectionManager()
+        dead, alive = FakeWebSocket(fail=True), FakeWebSocket()
+        await manager.connect(dead)
+        await manager.connect(alive)
+        await manager.broadcast("one")
+        await settle()
+        await manager.broadcast("two")
+        await settle()
+        assert dead not in manager.active_connections
+        assert alive.received == ["one", "two"]
+
+    asyncio.run(scenario())
+
+
+def test_drop_oldest_policy_keeps_latest_messages():
+    async def scenario():
+        manager = ConnectionManager(max_queue=2, policy=DROP_OLDEST)
+        client = FakeWebSocket()
+        client.gate.clear()
+        await manager.connect(client)
+        for i in range(5):
+            await manager.broadcast(str(i))
+        await settle()
+        client.gate.set()
+        await settle()
+        assert client.received == ["3", "4"]
+        assert manager.active_connections[client].dropped == 3
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_policy_closes_slow_consumer():
+    async def scenario():
+        manager = ConnectionManager(max_queue=1, policy=DISCONNECT)
+        client = FakeWebSocket()
+        client.gate.clear()
+        await manager.connect(client)
+        connection = manager.active_connections[client]
+        for i in range(3):
+            await manager.broadcast(str(i))
+        await settle()
+        assert client not in manager.active_connections
+        assert connection.closer.done()
+        assert client.closed_with == 1013
+
+    asyncio.run(scenario())
@@ -0,0 +1,100 @@
+# app/tests/test_write_buffer.py
+import asyncio
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+
+from app import crud
+from app.schemas import NoteCreate
+from app.write_buffer import NoteWriteBuffer
+
+
+def run_with_factory(tmp_path, scenario):
+    async def runner():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'notes.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        await scenario(sessionmaker(engine, class_=AsyncSession, expire_on_commit=False))
+        await engine.dispose()
+
+    asyncio.run(runner())
+
+
+def test_concurrent_submits_share_one_transaction(tmp_path):
+    async def scenario(session_factory):
+        committed = []
+
+        async def on_commit(notes):
+            committed.append([note.id for note in notes])
+
+        buffer = NoteWriteBuffer(session_factory, max_rows=100, max_delay=0.05, on_commit=on_commit)
+        await buffer.start()
+        notes = await asyncio.gather(*(buffer.submit(NoteCreate(text=f"n{i}")) for i in range(10)))
+        await buffer.stop()
+
+        assert [note.text for note in notes] == [f"n{i}" for i in range(10)]
+        assert sorted(note.id for note in notes) == list(range(1, 11))
+        assert committed == [[note.id for note in notes]]
+        async with session_factory() as session:
+            assert len(await crud.get_all_notes(session)) == 10
+
+    run_with_factory(tmp_path, scenario)
+
+
+def test_max_rows_splits_batches(tmp_path):
+    async def scenario(session_factory):
+        sizes = []
+
+        async def on_commit(notes):
+            sizes.append(len(notes))
+
+        buffer = NoteWriteBuffer(session_factory, max_rows=4, max_delay=10, on_commit=on_commit)
+        await buffer.start()
+        # max_delay большой: пачки уходят только по заполнению и при остановке
+        submits = [asyncio.ensure_future(buffer.submit(NoteCreate(text=str(i)))) for i in range(10)]
+        await asyncio.gather(*submits[:8])
+        await buffer.stop()
+        await asyncio.gather(*submits[8:])
+        assert sizes == [4, 4, 2]
+
+    run_with_factory(tmp_path, scenario)
+
+
+def test_failed_batch_fails_every_waiter(tmp_path):
+    async def scenario(session_factory):
+        def broken_factory():
+            raise RuntimeError("database is down")
+
+        buffer = NoteWriteBuffer(broken_factory, max_delay=0.01)
+        await buffer.start()
+        results = await asyncio.gather(*(buffer.submit(NoteCreate(text="x")) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        await buffer.stop()
+        with pytest.raises(RuntimeError):
+            await buffer.submit(NoteCreate(text="late"))
+
+    run_with_factory(tmp_path, scenario)
+
+
+def test_leftovers_keep_their_arrival_time(tmp_path):
+    async def scenario(session_factory):
+        async def on_commit(notes):
+            if notes[0].text == "0":
+                # Первая пачка пишется долго, остальные заметки приходят во время записи
+                await asyncio.sleep(0.3)
+
+        buffer = NoteWriteBuffer(session_factory, max_rows=2, max_delay=0.3, on_commit=on_commit)
+        await buffer.start()
+        first = [asyncio.ensure_future(buffer.submit(NoteCreate(text=str(i)))) for i in range(2)]
+        await asyncio.sleep(0.01)
+        submitted_at = time.monotonic()
+        rest = [asyncio.ensure_future(buffer.submit(NoteCreate(text=str(i)))) for i in range(2, 5)]
+        await asyncio.gather(*first, *rest)
+        # Остаток второй пачки ждёт max_delay от своего поступления, а не ещё max_delay после записи
+        assert time.monotonic() - submitted_at < 0.5
+        await buffer.stop()
+
+    run_with_factory(tmp_path, scenario)
@@ -1,22 +1,94 @@
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import List
+from typing import Dict, Optional, Union
+import asyncio
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+Message = Union[str, bytes]
+
+
+class Connection:
+    # У каждого клиента своя ограниченная очередь и своя задача-писатель:
+    # broadcast только кладёт сообщение в очереди и не ждёт медленных клиентов
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager", max_queue: int, policy: str):
+        self.websocket = websocket
+        self.manager = manager
+        self.policy = policy
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.writer = asyncio.create_task(self._write())
+        # Ссылку на задачу закрытия держим, иначе её может собрать GC до запуска
+        self.closer: Optional[asyncio.Task] = None
+
+    def enqueue(self, message: Message) -> bool:
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self.policy == DROP_OLDEST:
+            self.queue.get_nowait()
+            self.queue.put_nowait(message)
+            self.dropped += 1
+            return True
+        logger.warning("Slow websocket consumer disconnected")
+        self.manager.disconnect(self.websocket)
+        self.closer = asyncio.create_task(self._close(code=1013))
+        return False
+
+    async def _write(self):
+        try:
+            while True:
+                message = await self.queue.get()
+                if isinstance(message, bytes):
+                    await self.websocket.send_bytes(message)
+                else:
+                    await self.websocket.send_text(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Мёртвый сокет убираем, не прерывая рассылку остальным
+            self.manager.disconnect(self.websocket)
+
+    async def _close(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass
+
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, max_queue: int = 100, policy: str = DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError(f"Unknown slow consumer policy: {policy}")
+        self.max_queue = max_queue
+        self.policy = policy
+        # dict вместо списка: отключение за O(1)
+        self.active_connections: Dict[WebSocket, Connection] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections[websocket] = Connection(websocket, self, self.max_queue, self.policy)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+
+    async def send_personal_message(self, message: Message, websocket: WebSocket):
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            connection.enqueue(message)
 
-    async def send_personal_message(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
+    async def broadcast(self, message: Message):
+        for connection in list(self.active_connections.values()):
+            connection.enqueue(message)
 
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            await connection.send_text(message)
 
-manager = ConnectionManager()
+manager = ConnectionManager(max_queue=settings.WS_SEND_QUEUE_SIZE, policy=settings.WS_SLOW_CONSUMER_POLICY)
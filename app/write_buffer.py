@@ -0,0 +1,144 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app import crud
+from app.models import Note
+from app.schemas import NoteCreate
+
+logger = logging.getLogger("uvicorn.error")
+
+WRITE_BATCH_SIZE = Histogram(
+    "app_write_buffer_batch_size",
+    "Заметок в одной групповой транзакции",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+WRITE_BATCH_SECONDS = Histogram(
+    "app_write_buffer_flush_seconds",
+    "Время записи одной пачки (INSERT + commit)",
+)
+WRITE_BUFFER_ERRORS = Counter(
+    "app_write_buffer_errors_total",
+    "Неудачные записи пачек: insert (запросы получили ошибку) или commit после подтверждения",
+    ["stage"],
+)
+
+# commit — ответ после commit пачки (как при записи по одной);
+# flush — ответ после INSERT, commit идёт следом: при его сбое подтверждённые заметки теряются
+DURABILITY_MODES = ("commit", "flush")
+
+# Заметка, её future и момент поступления (от него считается max_delay)
+Pending = Tuple[NoteCreate, asyncio.Future, float]
+
+
+class NoteWriteBuffer:
+    """Group commit для POST /notes: заметки копятся до max_rows или max_delay и пишутся одной транзакцией.
+
+    Каждый запрос получает свою заметку с id. Пока пачка пишется, следующая уже набирается,
+    поэтому под нагрузкой пачки растут сами, а при редких запросах задержка не больше max_delay.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        max_rows: int = 100,
+        max_delay: float = 0.005,
+        durability: str = "commit",
+        on_commit: Optional[Callable[[List[Note]], Awaitable[None]]] = None,
+    ):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown durability mode: {durability}")
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.durability = durability
+        self.on_commit = on_commit
+        self._pending: List[Pending] = []
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def submit(self, note: NoteCreate) -> Note:
+        if self._closing or self._task is None:
+            raise RuntimeError("Write buffer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((note, future, time.monotonic()))
+        self._arrived.set()
+        if len(self._pending) >= self.max_rows:
+            self._full.set()
+        return await future
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._arrived.wait()
+            # Задержку отсчитываем от самой старой ждущей заметки, а не от конца прошлой записи:
+            # остаток прошлой пачки уже ждал, пока она писалась
+            remaining = self._pending[0][2] + self.max_delay - time.monotonic() if self._pending else 0
+            if remaining > 0 and not self._closing:
+                try:
+                    await asyncio.wait_for(self._full.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+            if not self._pending:
+                self._arrived.clear()
+            if len(self._pending) < self.max_rows:
+                self._full.clear()
+            if batch:
+                await self._write(batch)
+            if self._closing and not self._pending:
+                return
+
+    async def _write(self, batch: List[Pending]):
+        WRITE_BATCH_SIZE.observe(len(batch))
+        start = time.perf_counter()
+        created_at = datetime.utcnow()
+        notes_data = [note for note, _, _ in batch]
+        acknowledged = False
+        try:
+            async with self.session_factory() as session:
+                ids = await crud.bulk_create_notes(session, notes_data, created_at, commit=False)
+                notes = [Note(id=note_id, text=note.text, created_at=created_at) for note_id, note in zip(ids, notes_data)]
+                if self.durability == "flush":
+                    self._resolve(batch, notes)
+                    acknowledged = True
+                await session.commit()
+        except Exception as exc:
+            WRITE_BUFFER_ERRORS.labels("commit" if acknowledged else "insert").inc()
+            logger.error("Note write batch of %d failed", len(batch), exc_info=True)
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        finally:
+            WRITE_BATCH_SECONDS.observe(time.perf_counter() - start)
+        if self.on_commit is not None:
+            try:
+                await self.on_commit(notes)
+            except Exception:
+                logger.error("Write buffer on_commit hook failed", exc_info=True)
+        self._resolve(batch, notes)
+
+    @staticmethod
+    def _resolve(batch: List[Pending], notes: List[Note]):
+        for (_, future, _), note in zip(batch, notes):
+            if not future.done():
+                future.set_result(note)
+
+    async def stop(self):
+        # Уже принятые заметки дописываем, новые не принимаем
+        self._closing = True
+        self._full.set()
+        self._arrived.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
@@ -0,0 +1,74 @@
+"""Писем в секунду на воркер: send_email по одному против send_email_batch пачками.
+
+    python -m benchmarks.email_batch --emails 2000 --batch-size 100
+    python -m benchmarks.email_batch --smtp-host localhost --smtp-port 1025
+
+Задачи выполняются синхронно в текущем процессе (как в одном процессе воркера,
+без брокера). Без --smtp-host поднимается локальный отладочный aiosmtpd,
+который только принимает письма. Режим "per email" открывает новое соединение
+на каждое письмо — так работала отправка до пула.
+"""
+import argparse
+import socket
+import time
+
+from aiosmtpd.controller import Controller
+
+from app import mail, tasks
+
+
+class SinkHandler:
+    async def handle_DATA(self, server, session, envelope):
+        return "250 Message accepted"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def per_email(host, port, emails):
+    # size=0: соединение закрывается сразу после письма
+    tasks._smtp_pool = mail.SMTPPool(host, port, size=0)
+    for email in emails:
+        tasks.send_email.apply(args=[email]).get()
+
+
+def batched(host, port, emails, batch_size):
+    tasks._smtp_pool = mail.SMTPPool(host, port, size=1)
+    for start in range(0, len(emails), batch_size):
+        tasks.send_email_batch.apply(args=[emails[start:start + batch_size]]).get()
+    tasks._smtp_pool.close()
+
+
+def measure(name, run, count):
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<12} {count / elapsed:10.1f} emails/s  ({elapsed:.2f}s)")
+
+
+def main(args):
+    controller = None
+    host, port = args.smtp_host, args.smtp_port
+    if host is None:
+        host, port = "127.0.0.1", free_port()
+        controller = Controller(SinkHandler(), hostname=host, port=port)
+        controller.start()
+    emails = [f"user{i}@example.com" for i in range(args.emails)]
+    try:
+        measure("per email", lambda: per_email(host, port, emails), len(emails))
+        measure("batched", lambda: batched(host, port, emails, args.batch_size), len(emails))
+    finally:
+        if controller is not None:
+            controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--smtp-host", default=None)
+    parser.add_argument("--smtp-port", type=int, default=1025)
+    main(parser.parse_args())
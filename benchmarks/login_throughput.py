@@ -0,0 +1,80 @@
+"""Login (bcrypt verify) throughput: shared threadpool vs dedicated process pool.
+
+    python -m benchmarks.login_throughput --logins 200 --concurrency 32
+
+While the burst runs, a probe keeps submitting trivial jobs to the shared
+threadpool (the one that serves sync handlers) and records how long each waits;
+its p99 shows how much a login burst starves unrelated requests.
+Run on a multi-core box: the process pool scales with --workers.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from app.hashing import HashingPoolSaturated, PasswordHasher, pwd_context
+
+
+async def burst(verify, hashed: str, logins: int, concurrency: int):
+    remaining = iter(range(logins))
+    rejected = 0
+
+    async def worker():
+        nonlocal rejected
+        for _ in remaining:
+            try:
+                assert await verify("secret", hashed)
+            except HashingPoolSaturated:
+                rejected += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, rejected
+
+
+async def probe(stop: asyncio.Event, samples: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await run_in_threadpool(lambda: None)
+        samples.append(time.perf_counter() - start)
+        await asyncio.sleep(0.005)
+
+
+async def scenario(name: str, verify, hashed: str, args):
+    samples: list = []
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(stop, samples))
+    elapsed, rejected = await burst(verify, hashed, args.logins, args.concurrency)
+    stop.set()
+    await probe_task
+    samples.sort()
+    p99 = samples[max(0, int(len(samples) * 0.99) - 1)] * 1000
+    accepted = args.logins - rejected
+    print(f"{name:<12} {accepted / elapsed:8.1f} logins/s  rejected={rejected:<5} threadpool probe p99={p99:8.2f}ms")
+
+
+async def main(args):
+    hashed = pwd_context.hash("secret")
+
+    async def threadpool_verify(plain, hashed_password):
+        return await run_in_threadpool(pwd_context.verify, plain, hashed_password)
+
+    await scenario("threadpool", threadpool_verify, hashed, args)
+
+    hasher = PasswordHasher(max_workers=args.workers, max_queue=args.max_queue)
+    await hasher.start()
+    try:
+        await scenario("processpool", hasher.verify, hashed, args)
+    finally:
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-queue", type=int, default=None)
+    asyncio.run(main(parser.parse_args()))
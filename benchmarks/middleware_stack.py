@@ -0,0 +1,127 @@
+"""До/после: стек BaseHTTPMiddleware против чистых ASGI middleware.
+
+    python -m benchmarks.middleware_stack --requests 5000 --concurrency 50
+    python -m benchmarks.middleware_stack --redis-url redis://localhost:6379/0
+
+Оба стека включают rate limiter и access log
+и обслуживают одинаковые /health и /notes; приложение гоняется in-process
+через httpx.ASGITransport. Старые реализации воспроизведены ниже в Legacy*.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+import traceback
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from app.middleware.access_log import AccessLogMiddleware
+from app.middleware.rate_limiter import RateLimiter, RateLimiterMiddleware, RateLimitRule
+from benchmarks.rate_limiter import make_client
+
+NOTES = [{"id": i, "text": f"note {i}", "created_at": "2025-07-07T12:00:00"} for i in range(200)]
+UNLIMITED = RateLimitRule(10**9, 60)
+
+
+class LegacyRateLimiterMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app):
+        super().__init__(app)
+        self.limiter = RateLimiter()
+
+    async def dispatch(self, request: Request, call_next):
+        result = await self.limiter.hit(request.app.state.redis, f"bench:legacy:{request.client.host}", UNLIMITED)
+        if not result.allowed:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests. Please try again later."})
+        response = await call_next(request)
+        response.headers.update(result.headers)
+        return response
+
+
+def build_app(stack: str, redis_client, logger: logging.Logger) -> FastAPI:
+    app = FastAPI()
+    app.state.redis = redis_client
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/notes")
+    async def notes():
+        return NOTES
+
+    if stack == "legacy":
+        app.add_middleware(LegacyRateLimiterMiddleware)
+
+        @app.middleware("http")
+        async def log_requests(request: Request, call_next):
+            start_time = time.time()
+            try:
+                response = await call_next(request)
+            except Exception as e:
+                logger.error(json.dumps({"error": str(e), "trace": traceback.format_exc()}))
+                raise
+            logger.info(json.dumps({
+                "method": request.method,
+                "url": request.url.path,
+                "status_code": response.status_code,
+                "duration": round(time.time() - start_time, 4),
+            }))
+            return response
+    else:
+        app.add_middleware(RateLimiterMiddleware, default_rule=UNLIMITED, route_rules={})
+        app.add_middleware(AccessLogMiddleware, logger=logger)
+    return app
+
+
+async def run(app: FastAPI, path: str, total: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.get(path)
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args):
+    logger = logging.getLogger("benchmarks.access")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler(open(os.devnull, "w")))
+
+    for path in ("/health", "/notes"):
+        for stack in ("legacy", "asgi"):
+            redis_client = make_client(args.redis_url)
+            await redis_client.flushdb()
+            result = await run(build_app(stack, redis_client, logger), path, args.requests, args.concurrency)
+            print(f"{path:<8} {stack:<7} rps={result['rps']:8.0f}  p50={result['p50_ms']:7.2f}ms  p99={result['p99_ms']:7.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="fake")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
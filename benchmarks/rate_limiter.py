@@ -0,0 +1,83 @@
+"""Микробенчмарк: сколько времени rate limiter добавляет к каждому запросу.
+
+    python -m benchmarks.rate_limiter --redis-url redis://localhost:6379/0
+    python -m benchmarks.rate_limiter --redis-url fake   # fakeredis, без сети
+
+Для каждого алгоритма сравнивается один вызов Lua-скрипта с голым PING
+(нижняя граница round trip) и со старой схемой GET + SET/INCR.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.middleware.rate_limiter import SCRIPTS, RateLimiter, RateLimitRule
+
+
+def make_client(url: str):
+    if url == "fake":
+        import fakeredis
+
+        return fakeredis.FakeAsyncRedis(decode_responses=True)
+    import redis.asyncio as redis
+
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+async def measure(iterations: int, call) -> list:
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await call(i)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return samples
+
+
+def report(name: str, samples: list, baseline: float):
+    samples.sort()
+    p50 = statistics.median(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f"{name:<22} p50={p50:8.1f}us  p99={p99:8.1f}us  +{p50 - baseline:7.1f}us vs PING")
+
+
+async def legacy_check(redis_client, key: str, limit: int, window: int):
+    # Прежняя схема из dispatch: GET, затем SET или INCR
+    current = await redis_client.get(key)
+    if current is None:
+        await redis_client.set(key, 1, ex=window)
+    elif int(current) < limit:
+        await redis_client.incr(key)
+
+
+async def main(args):
+    redis_client = make_client(args.redis_url)
+    limiter = RateLimiter()
+    # Лимит заведомо не достигается: меряем путь обычного запроса
+    limit = args.iterations * 10
+
+    await measure(args.warmup, lambda i: redis_client.ping())
+    ping = await measure(args.iterations, lambda i: redis_client.ping())
+    baseline = statistics.median(ping)
+    report("PING", ping, baseline)
+
+    legacy = await measure(args.iterations, lambda i: legacy_check(redis_client, "bench:legacy", limit, 60))
+    report("legacy GET+SET/INCR", legacy, baseline)
+
+    for algorithm in SCRIPTS:
+        rule = RateLimitRule(limit, 60, algorithm)
+        key = f"bench:{algorithm}"
+        await measure(args.warmup, lambda i: limiter.hit(redis_client, key, rule))
+        await redis_client.delete(key)
+        samples = await measure(args.iterations, lambda i: limiter.hit(redis_client, key, rule))
+        report(algorithm, samples, baseline)
+        await redis_client.delete(key)
+
+    await redis_client.delete("bench:legacy")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,313 @@
+"""End-to-end load benchmarks for both apps with baselines and a regression gate.
+
+    python -m benchmarks.suite                              # all apps, both modes
+    python -m benchmarks.suite --apps main --modes uvicorn --requests 5000
+    python -m benchmarks.suite --save-baseline              # record benchmarks/baselines.json
+    python -m benchmarks.suite --threshold 0.2              # exit 1 on a >20% regression
+
+Every (app, mode) pair runs in its own process, so module-level state and RSS
+are not shared between runs. Redis is replaced by fakeredis and the
+database is a temporary SQLite file, so no services are needed.
+
+"inprocess" drives the ASGI app through httpx.ASGITransport; "uvicorn" starts
+a real uvicorn server on a free port and talks to it over TCP (the /ws
+broadcast scenario only runs there). For every scenario the suite reports
+RPS, p50/p95/p99 latency and the RSS of the serving process after the run
+(in-process mode: the benchmark process itself, client included).
+
+Baselines are machine-specific: record them on the box that runs the gate.
+A scenario regresses when RPS drops, or p95 or RSS grows, by more than
+--threshold relative to its baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+APPS = ["main", "final"]
+MODES = ["inprocess", "uvicorn"]
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines.json")
+SEED_NOTES = 200
+
+
+def prepare_environment(app_name: str, workdir: str):
+    """Point the app at SQLite/fakeredis; must run before the app is imported."""
+    database = os.path.join(workdir, f"{app_name}.db")
+    if app_name == "main":
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{database}"
+        # The rate limiter still runs on every request, it just never rejects
+        os.environ["RATE_LIMIT_REQUESTS"] = str(10 ** 9)
+        # The closed-loop driver bounds concurrency itself; load shedding would only turn
+        # queueing into errors. Set ADMISSION_ENABLED=true to measure with it on.
+        os.environ.setdefault("ADMISSION_ENABLED", "false")
+    else:
+        os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+        os.environ.pop("NOTES_REDIS_URL", None)
+
+    import fakeredis
+    import redis.asyncio as redis
+
+    fake = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    redis.Redis.from_url = classmethod(lambda cls, *args, **kwargs: fake)
+    import app.redis_client
+
+    app.redis_client.create_redis_client = lambda *args, **kwargs: fake
+
+
+def load_app(app_name: str):
+    if app_name == "main":
+        from app.main import app
+    else:
+        from app.notes_api_final import app
+    return app
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def summarize(latencies, elapsed: float, errors: int, pid: int) -> dict:
+    latencies.sort()
+
+    def percentile(q):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+
+    return {
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(0.95), 2),
+        "p99_ms": round(percentile(0.99), 2),
+        "errors": errors,
+        "rss_mb": round(rss_mb(pid), 1),
+    }
+
+
+async def load(client, make_request, total: int, concurrency: int, pid: int) -> dict:
+    latencies, errors = [], 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await make_request(client, i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors, pid)
+
+
+async def main_scenarios(client, args, pid: int) -> dict:
+    notes = [{"text": f"note {i}"} for i in range(SEED_NOTES)]
+    assert (await client.post("/notes/bulk", json=notes)).status_code == 200
+    scenarios = {
+        "notes_list": lambda c, i: c.get("/notes"),
+        "notes_page": lambda c, i: c.get("/notes", params={"limit": 50}),
+        "notes_create": lambda c, i: c.post("/notes", json={"text": f"bench {i}"}),
+        "health_rate_limited": lambda c, i: c.get("/health"),
+    }
+    return {name: await load(client, request, args.requests, args.concurrency, pid) for name, request in scenarios.items()}
+
+
+async def final_scenarios(client, args, pid: int) -> dict:
+    credentials = {"username": "bench", "password": "bench-password"}
+    await client.post("/register", json=credentials)
+    token = (await client.post("/login", data=credentials)).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for i in range(SEED_NOTES // 4):
+        await client.post("/notes", json={"title": f"t{i}", "content": "bench"}, headers=headers)
+    scenarios = {
+        "notes_list": lambda c, i: c.get("/notes", params={"limit": 10}, headers=headers),
+        "note_get": lambda c, i: c.get("/notes/1", headers=headers),
+        "notes_create": lambda c, i: c.post("/notes", json={"title": f"b{i}", "content": "bench"}, headers=headers),
+    }
+    results = {name: await load(client, request, args.requests, args.concurrency, pid) for name, request in scenarios.items()}
+    # bcrypt is deliberately slow: a smaller sample, and no more concurrency than the
+    # hashing pool accepts before failing fast with 503
+    login = lambda c, i: c.post("/login", data=credentials)  # noqa: E731
+    results["login"] = await load(client, login, max(args.requests // 20, 10), min(args.concurrency, os.cpu_count() or 1), pid)
+    return results
+
+
+async def ws_broadcast(port: int, args, pid: int) -> dict:
+    import websockets
+
+    clients = [await websockets.connect(f"ws://127.0.0.1:{port}/ws") for _ in range(args.ws_clients)]
+    messages = max(args.requests // args.ws_clients, 10)
+    latencies = []
+
+    async def receive(connection):
+        for _ in range(messages):
+            # "📨 Сообщение: <perf_counter at send>"
+            sent_at = float((await connection.recv()).rsplit(" ", 1)[1])
+            latencies.append(time.perf_counter() - sent_at)
+
+    receivers = [asyncio.create_task(receive(connection)) for connection in clients]
+    start = time.perf_counter()
+    for _ in range(messages):
+        await clients[0].send(repr(time.perf_counter()))
+    await asyncio.gather(*receivers)
+    elapsed = time.perf_counter() - start
+    for connection in clients:
+        await connection.close()
+    return summarize(latencies, elapsed, 0, pid)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run_inprocess(args) -> dict:
+    import httpx
+
+    app = load_app(args.app)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            scenarios = main_scenarios if args.app == "main" else final_scenarios
+            return await scenarios(client, args, os.getpid())
+
+
+async def run_uvicorn(args) -> dict:
+    import httpx
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.suite", "--serve", "--app", args.app, "--port", str(port), "--workdir", args.workdir],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/docs")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("uvicorn did not start")
+            if args.app == "main":
+                results = await main_scenarios(client, args, server.pid)
+                results["ws_broadcast"] = await ws_broadcast(port, args, server.pid)
+                return results
+            return await final_scenarios(client, args, server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def serve(args):
+    import uvicorn
+
+    prepare_environment(args.app, args.workdir)
+    uvicorn.run(load_app(args.app), host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+def worker(args):
+    if args.mode == "inprocess":
+        prepare_environment(args.app, args.workdir)
+        results = asyncio.run(run_inprocess(args))
+    else:
+        results = asyncio.run(run_uvicorn(args))
+    with open(args.output, "w") as output:
+        json.dump(results, output)
+
+
+def run_pair(app_name: str, mode: str, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"bench-{app_name}-{mode}-")
+    output = os.path.join(workdir, "results.json")
+    command = [
+        sys.executable, "-m", "benchmarks.suite", "--worker",
+        "--app", app_name, "--mode", mode, "--workdir", workdir, "--output", output,
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--ws-clients", str(args.ws_clients),
+    ]
+    # The apps log every request to stdout; keep the report readable
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    with open(output) as results:
+        return json.load(results)
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if current["rps"] < previous["rps"] * (1 - threshold):
+            regressions.append(f"{key}: rps {previous['rps']} -> {current['rps']}")
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{key}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["rss_mb"] > previous["rss_mb"] * (1 + threshold):
+            regressions.append(f"{key}: rss {previous['rss_mb']}MB -> {current['rss_mb']}MB")
+    return regressions
+
+
+def main(args):
+    results = {}
+    print(f"{'scenario':<36} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'rss':>8} errors")
+    for app_name in args.apps:
+        for mode in args.modes:
+            for scenario, stats in run_pair(app_name, mode, args).items():
+                key = f"{app_name}/{mode}/{scenario}"
+                results[key] = stats
+                print(
+                    f"{key:<36} {stats['rps']:9.1f} {stats['p50_ms']:7.2f}ms {stats['p95_ms']:7.2f}ms "
+                    f"{stats['p99_ms']:7.2f}ms {stats['rss_mb']:6.1f}MB {stats['errors']}"
+                )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline:
+            json.dump(results, baseline, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline first")
+        return 0
+    with open(args.baseline) as baseline:
+        regressions = compare(results, json.load(baseline), args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=APPS)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--ws-clients", type=int, default=20)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    # Internal: one (app, mode) pair per process, and the uvicorn server itself
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--app", choices=APPS, help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args)
+    elif args.worker:
+        worker(args)
+    else:
+        sys.exit(main(args))
@@ -0,0 +1,94 @@
+"""Broadcast latency for simulated WebSocket clients: sequential send vs per-connection queues.
+
+    python -m benchmarks.websocket_broadcast --clients 1000 10000 --slow-fraction 0.01
+
+Clients are in-memory stand-ins: each send yields to the loop, and a fraction
+of them take --slow-ms per message. "enqueue" is how long broadcast() blocks
+the caller; "delivered" is when the last fast client has the message.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.websocket import ConnectionManager
+
+
+class SimulatedClient:
+    def __init__(self, delay: float, on_receive):
+        self.delay = delay
+        self.on_receive = on_receive
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message):
+        await asyncio.sleep(self.delay)
+        self.on_receive(self)
+
+    async def close(self, code=1000):
+        pass
+
+
+async def legacy_broadcast(clients, message):
+    # Прежний ConnectionManager.broadcast: по очереди, каждый send ждём
+    for client in clients:
+        await client.send_text(message)
+
+
+def make_clients(count: int, slow_fraction: float, slow_delay: float, on_receive):
+    rng = random.Random(7)
+    return [SimulatedClient(slow_delay if rng.random() < slow_fraction else 0, on_receive) for _ in range(count)]
+
+
+async def run(count: int, args):
+    slow_delay = args.slow_ms / 1000
+    fast_total = 0
+    fast_received = 0
+    done = asyncio.Event()
+
+    def on_receive(client):
+        nonlocal fast_received
+        if client.delay == 0:
+            fast_received += 1
+            if fast_received == fast_total:
+                done.set()
+
+    clients = make_clients(count, args.slow_fraction, slow_delay, on_receive)
+    fast_total = sum(1 for client in clients if client.delay == 0)
+
+    start = time.perf_counter()
+    await legacy_broadcast(clients, "hello")
+    legacy = time.perf_counter() - start
+
+    fast_received = 0
+    done.clear()
+    manager = ConnectionManager(max_queue=args.queue_size)
+    for client in clients:
+        await manager.connect(client)
+    start = time.perf_counter()
+    await manager.broadcast("hello")
+    enqueue = time.perf_counter() - start
+    await done.wait()
+    delivered = time.perf_counter() - start
+    for client in clients:
+        manager.disconnect(client)
+
+    print(
+        f"{count:>6} clients  legacy={legacy * 1000:9.1f}ms  "
+        f"queued: enqueue={enqueue * 1000:7.2f}ms delivered={delivered * 1000:8.1f}ms"
+    )
+
+
+async def main(args):
+    for count in args.clients:
+        await run(count, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--slow-fraction", type=float, default=0.01)
+    parser.add_argument("--slow-ms", type=float, default=50)
+    parser.add_argument("--queue-size", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))